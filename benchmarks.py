@@ -0,0 +1,376 @@
+import sys
+import json
+import time
+import timeit
+import platform
+import tracemalloc
+import graphics
+import gamemodel
+import gamegraphics
+
+"""
+    Benchmarks for the game model and graphics.
+    Run with: python benchmarks.py [name ...]
+    Every benchmark prints one JSON object per result line.
+
+    Numbers (floats) in the results are measurements where lower is better, the other fields identify
+    the result. Two runs saved to files can be compared with:
+        python benchmarks.py compare old.jsonl new.jsonl [threshold]
+    which lists the measurements that got more than threshold (default 0.1, i.e. 10%) worse.
+"""
+
+# No benchmark needs a real window
+graphics.setHeadless(True)
+
+
+# Average number of bytes allocated per object made by make(), not counting the list holding them
+def _bytesPerObject(make, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make() for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before - sys.getsizeof(objects)) / count
+
+
+# A class with the same constructor as cls but no __slots__, i.e. the layout these classes used to have
+def _withDict(cls):
+    return type(cls.__name__ + "WithDict", (), {"__init__": cls.__init__})
+
+
+# graphics.Point as it used to be: a __dict__, its own configuration dictionary and a setFill alias
+class _PointWithDict:
+    def __init__(self, x, y):
+        graphics.GraphicsObject.__init__(self, ["outline", "fill"])
+        self.setFill = graphics.GraphicsObject.setOutline.__get__(self)
+        self.x = float(x)
+        self.y = float(y)
+
+
+""" Bytes per object for Projectile, Player and graphics.Point, with __slots__ and with a per-instance __dict__ """
+def benchMemory(count=100000):
+    game = gamemodel.Game(10, 3)
+    constructors = [
+        (gamemodel.Projectile, _withDict(gamemodel.Projectile), lambda cls: cls(45, 40, 0, -90, 5, -110, 110)),
+        (gamemodel.Player, _withDict(gamemodel.Player), lambda cls: cls(game, "blue", -90)),
+        (graphics.Point, _PointWithDict, lambda cls: cls(1, 2)),
+    ]
+    results = []
+    for cls, twin, make in constructors:
+        results.append({
+            "benchmark": "memory",
+            "class": cls.__name__,
+            "bytesPerObjectSlots": _bytesPerObject(lambda: make(cls), count),
+            "bytesPerObjectDict": _bytesPerObject(lambda: make(twin), count),
+        })
+    return results
+
+
+# A headless window that keeps its items in a plain list, the way GraphWin used to
+class _ListGraphWin(graphics.HeadlessGraphWin):
+    def __init__(self, *args):
+        graphics.HeadlessGraphWin.__init__(self, *args)
+        self.items = []
+
+    def addItem(self, item):
+        self.items.append(item)
+
+    def delItem(self, item):
+        self.items.remove(item)
+
+
+""" Seconds to draw and then undraw (in drawing order) count items, with the item registry and with a list """
+def benchItems(count=50000):
+    results = []
+    for name, windowClass in (("registry", graphics.HeadlessGraphWin), ("list", _ListGraphWin)):
+        win = windowClass("benchmark", 640, 480, False)
+        win.setCoords(-110, -10, 110, 155)
+        dots = [graphics.Circle(graphics.Point(i % 220 - 110, i % 150), 1) for i in range(count)]
+        start = time.perf_counter()
+        for dot in dots:
+            dot.draw(win)
+        drawn = time.perf_counter()
+        for dot in dots:
+            dot.undraw()
+        undrawn = time.perf_counter()
+        results.append({"benchmark": "items", "registry": name, "items": count,
+                        "drawSeconds": drawn - start, "undrawSeconds": undrawn - drawn})
+    return results
+
+
+""" Seconds for one setCoords on a window with count items, moving items in place and with undraw/redraw """
+def benchSetCoords(counts=(100, 1000, 10000)):
+    results = []
+    for count in counts:
+        win = graphics.HeadlessGraphWin("benchmark", 640, 480, False)
+        win.setCoords(-110, -10, 110, 155)
+        for i in range(count):
+            graphics.Circle(graphics.Point(i % 220 - 110, i % 150), 1).draw(win)
+        start = time.perf_counter()
+        win.setCoords(-120, -20, 120, 165)
+        remapped = time.perf_counter()
+        win.trans = graphics.Transform(win.width, win.height, -110, -10, 110, 155)
+        win.redraw()
+        redrawn = time.perf_counter()
+        results.append({"benchmark": "setCoords", "items": count,
+                        "remapSeconds": remapped - start, "redrawSeconds": redrawn - remapped})
+    return results
+
+
+# Nanoseconds per call of func, the best of repeat runs of number calls each
+def _nsPerCall(func, number=100000, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+""" Nanoseconds per call of the model hot paths: Projectile.update and isMoving, Player.projectileDistance and fire """
+def benchModel(number=100000):
+    game = gamemodel.Game(10, 3)
+    game.setCurrentWind(1.5)
+    player = game.getCurrentPlayer()
+    other = game.getOtherPlayer()
+    # A projectile high up moves for the whole run
+    proj = gamemodel.Projectile(80, 40, 1.5, -90, 1e12, -1e12, 1e12)
+    landed = player.fire(45, 40)
+    landed.land(1/50)
+    calls = [
+        ("Projectile.update", lambda: proj.update(1/50)),
+        ("Projectile.isMoving", proj.isMoving),
+        ("Player.projectileDistance", lambda: other.projectileDistance(landed)),
+        ("Player.fire", lambda: player.fire(45, 40)),
+    ]
+    return [{"benchmark": "model", "call": name, "nsPerCall": _nsPerCall(func, number)} for name, func in calls]
+
+
+""" Nanoseconds per call of the rendering hot paths on a headless canvas: Transform.screen and world, GraphicsObject.move and PlayerGraphics.sync """
+def benchRender(number=20000):
+    trans = graphics.Transform(640, 480, -110, -10, 110, 155)
+    win = graphics.GraphWin("benchmark", 640, 480, False)
+    win.setCoords(-110, -10, 110, 155)
+    circle = graphics.Circle(graphics.Point(0, 50), 3)
+    circle.draw(win)
+    steps = [1, -1]
+
+    def move():
+        steps.reverse()
+        circle.move(steps[0], steps[0])
+
+    game = gamemodel.Game(10, 3)
+    ggame = gamegraphics.GameGraphics(game)
+    game.getCurrentPlayer().fire(45, 40).update(1)
+    playerGraphics = ggame.playerGraphics[game.getCurrentPlayerNumber()]
+    # The ball moves every call, sync does nothing for a ball that stays put
+    positions = [(10.0, 50.0), (11.0, 51.0)]
+
+    def sync():
+        positions.reverse()
+        playerGraphics.sync(positions[0])
+
+    calls = [
+        ("Transform.screen", lambda: trans.screen(12.5, 40.25)),
+        ("Transform.world", lambda: trans.world(320, 240)),
+        ("GraphicsObject.move", move),
+        ("PlayerGraphics.sync", sync),
+    ]
+    return [{"benchmark": "render", "call": name, "nsPerCall": _nsPerCall(func, number)} for name, func in calls]
+
+
+""" Nanoseconds per projectile for one time step of count projectiles, with Projectile.update and with gamebatch """
+def benchProjectileScaling(counts=(1, 10, 100, 1000, 10000, 100000, 1000000)):
+    import gamebatch
+    results = []
+    for count in counts:
+        # Started high up so they keep moving for all steps
+        projectiles = [gamemodel.Projectile(10 + i % 70, 20 + i % 60, 1.5, -90, 1e9, -1e12, 1e12) for i in range(count)]
+        # Enough steps to time small counts reliably
+        steps = max(1, 100000 // count)
+        start = time.perf_counter()
+        for i in range(steps):
+            for proj in projectiles:
+                proj.update(1/50)
+        updated = time.perf_counter()
+        batch = gamebatch.BatchProjectiles.fromProjectiles(projectiles)
+        batchStart = time.perf_counter()
+        for i in range(steps):
+            batch.update(1/50)
+        batchUpdated = time.perf_counter()
+        results.append({"benchmark": "projectileScaling", "projectiles": count,
+                        "updateNsPerProjectile": (updated - start) / (steps*count) * 1e9,
+                        "batchNsPerProjectile": (batchUpdated - batchStart) / (steps*count) * 1e9})
+        del projectiles, batch
+    return results
+
+
+""" Nanoseconds per item to move every item once, and per item to draw them, on a headless canvas with count items """
+def benchCanvasScaling(counts=(10, 100, 1000, 10000, 100000)):
+    results = []
+    for count in counts:
+        win = graphics.GraphWin("benchmark", 640, 480, False)
+        win.setCoords(-110, -10, 110, 155)
+        dots = [graphics.Circle(graphics.Point(i % 220 - 110, i % 150), 1) for i in range(count)]
+        start = time.perf_counter()
+        for dot in dots:
+            dot.draw(win)
+        drawn = time.perf_counter()
+        passes = max(1, 100000 // count)
+        for i in range(passes):
+            for dot in dots:
+                dot.move(0.5, 0.5)
+        moved = time.perf_counter()
+        results.append({"benchmark": "canvasScaling", "items": count,
+                        "drawNsPerItem": (drawn - start) / count * 1e9,
+                        "moveNsPerItem": (moved - drawn) / (passes*count) * 1e9})
+    return results
+
+
+# PlayerGraphics.sync as it used to be: reads the ball position back as a new Point and sets the score text every frame
+def _syncWithPoints(playerGraphics, ballPos=None):
+    proj = playerGraphics.player.getProjectile()
+    if proj is not None:
+        if ballPos is None:
+            ballPos = proj.getX(), proj.getY()
+        ballX, ballY = ballPos
+        center = playerGraphics.circle.getCenter()
+        playerGraphics.circle.move(ballX - center.getX(), ballY - center.getY())
+    playerGraphics.txt.setText("Score: " + str(playerGraphics.player.getScore()))
+
+
+# The average over the positions of the memory blocks allocated during frame(ballPos). The number of
+# allocated blocks is read at every call and return inside the frame and its increases are added up,
+# so blocks that are freed again before the frame ends are counted too.
+def _allocations(frame, positions):
+    blocks = sys.getallocatedblocks
+    total = 0
+    last = 0
+
+    def profile(frameObject, event, arg):
+        nonlocal total, last
+        now = blocks()
+        if now > last:
+            total += now - last
+        # Read again, so the int made for now isn't counted at the next event
+        last = blocks()
+
+    for ballPos in positions:
+        last = blocks()
+        sys.setprofile(profile)
+        frame(ballPos)
+        sys.setprofile(None)
+    return total / len(positions)
+
+
+"""
+    Syncing the players of a game for every frame of a flight, with PlayerGraphics.sync and with the old path
+    that allocated a Point and the score text every frame: nanoseconds per frame, memory blocks allocated
+    per frame (beyond those of calling an empty frame, including blocks freed before the frame ends) and
+    canvas calls per frame
+"""
+def benchSync(repeat=20):
+    results = []
+    for name in ("sync", "syncWithPoints"):
+        game = gamemodel.Game(10, 3)
+        ggame = gamegraphics.GameGraphics(game)
+        win = ggame.getWindow()
+        proj = game.getCurrentPlayer().fire(45, 40)
+        # The ball positions of the frames, made before timing so they aren't counted
+        positions = []
+        while proj.isMoving():
+            proj.update(1/50)
+            positions.append((proj.getX(), proj.getY()))
+        ggame.sync()
+        current = game.getCurrentPlayer()
+        players = [(playerGraphics, playerGraphics.player is current) for playerGraphics in ggame.playerGraphics]
+        sync = gamegraphics.PlayerGraphics.sync if name == "sync" else _syncWithPoints
+
+        def frame(ballPos):
+            for playerGraphics, isCurrent in players:
+                sync(playerGraphics, ballPos if isCurrent else None)
+
+        start = time.perf_counter()
+        for i in range(repeat):
+            for ballPos in positions:
+                frame(ballPos)
+        elapsed = time.perf_counter() - start
+
+        allocations = _allocations(frame, positions) - _allocations(lambda ballPos: None, positions)
+
+        # Counts the calls of the canvas methods the objects use to change what is drawn
+        calls = [0]
+
+        def counted(method):
+            def call(*args, **kwargs):
+                calls[0] += 1
+                return method(*args, **kwargs)
+            return call
+        for method in ("move", "coords", "itemconfig"):
+            setattr(win, method, counted(getattr(win, method)))
+        for ballPos in positions:
+            frame(ballPos)
+
+        frames = repeat*len(positions)
+        results.append({"benchmark": "sync", "path": name, "frames": len(positions),
+                        "nsPerFrame": elapsed / frames * 1e9,
+                        "allocationsPerFrame": allocations,
+                        "canvasCallsPerFrame": calls[0] / len(positions)})
+    return results
+
+
+BENCHMARKS = {
+    "memory": benchMemory,
+    "items": benchItems,
+    "setCoords": benchSetCoords,
+    "model": benchModel,
+    "render": benchRender,
+    "projectileScaling": benchProjectileScaling,
+    "canvasScaling": benchCanvasScaling,
+    "sync": benchSync,
+}
+
+
+# The results in a file written by this script, by their identifying fields
+def _loadResults(path):
+    results = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                key = tuple(sorted((k, v) for k, v in result.items() if not isinstance(v, float)))
+                results[key] = result
+    return results
+
+
+"""
+    Compares two saved runs and returns a list of dicts, one for each measurement present in both,
+    with the old and new value, their ratio and whether it is a regression (more than threshold worse)
+"""
+def compare(oldPath, newPath, threshold=0.1):
+    old = _loadResults(oldPath)
+    new = _loadResults(newPath)
+    comparisons = []
+    for key, newResult in new.items():
+        oldResult = old.get(key)
+        if oldResult is None:
+            continue
+        for field, value in newResult.items():
+            if isinstance(value, float) and isinstance(oldResult.get(field), float) and oldResult[field] > 0:
+                ratio = value / oldResult[field]
+                comparisons.append({"result": dict(key), "field": field, "old": oldResult[field], "new": value,
+                                    "ratio": ratio, "regression": ratio > 1 + threshold})
+    return comparisons
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["compare"]:
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 0.1
+        regressions = 0
+        for comparison in compare(sys.argv[2], sys.argv[3], threshold):
+            print(json.dumps(comparison))
+            regressions += comparison["regression"]
+        sys.exit(1 if regressions else 0)
+
+    names = sys.argv[1:] or list(BENCHMARKS)
+    # Identifies the machine, so only comparable runs are compared
+    environment = {"python": platform.python_version(), "machine": platform.machine()}
+    for name in names:
+        for result in BENCHMARKS[name]():
+            result.update(environment)
+            print(json.dumps(result))
@@ -0,0 +1,200 @@
+import sys
+import json
+import functools
+from array import array
+from time import perf_counter
+import graphics
+import gamemodel
+import gamegraphics
+
+"""
+    Per-frame timing of the flight animation (gamegraphics.FlightLoop).
+
+    While a FrameProfiler is enabled the methods listed in PHASES are replaced by timing wrappers,
+    and every frame records the time spent in each phase and how often each was called. A frame runs
+    from one FlightLoop.step to the next, so it includes the pause in graphics.update. Phase times
+    are exclusive: a Tk call made from GameGraphics.sync counts as "draw", not as "sync".
+    Disabled, the original methods are back in place and nothing is measured.
+
+        with FrameProfiler() as profiler:
+            graphicFire(game, graphics, 45, 40)
+        print(profiler.summary())
+"""
+
+# The methods timed for each phase, as (owner, method name)
+PHASES = {
+    "physics": [(gamemodel.Projectile, "update")],
+    "sync": [(gamegraphics.GameGraphics, "sync"), (gamegraphics.PlayerGraphics, "sync")],
+    "draw": [(graphics.GraphicsObject, "draw"), (graphics.GraphicsObject, "undraw"),
+             (graphics.GraphicsObject, "move"), (graphics.Text, "setText")],
+    # FlightLoop calls the update imported into gamegraphics
+    "update": [(graphics, "update"), (gamegraphics, "update")],
+}
+
+
+class FrameProfiler:
+    """
+        capacity: the number of frames kept, older ones are overwritten
+        phases: the phases to time, see PHASES
+    """
+    def __init__(self, capacity=1024, phases=PHASES):
+        self.capacity = capacity
+        self.phases = phases
+        self.phaseNames = list(phases)
+        # Each frame is one row: frame time, the time of every phase, the call count of every phase, dropped frames
+        self.fields = (["frame"] + [name + "Seconds" for name in self.phaseNames]
+                       + [name + "Calls" for name in self.phaseNames] + ["dropped"])
+        self.frames = array("d", bytes(8*capacity*len(self.fields)))
+        self.frameCount = 0
+        self.enabled = False
+        self._originals = []
+        self._times = [0.0]*len(self.phaseNames)
+        self._counts = [0]*len(self.phaseNames)
+        # Time spent in timed calls made from the timed call running at each level
+        self._children = []
+        self._frameStart = None
+        self._loop = None
+        self._loopDropped = 0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    """ Starts timing by replacing the methods of the phases with timing wrappers """
+    def enable(self):
+        if self.enabled:
+            return
+        if getattr(gamegraphics.FlightLoop.step, "_frameProfiler", None) is not None:
+            raise RuntimeError("another FrameProfiler is enabled")
+        for index, name in enumerate(self.phaseNames):
+            for owner, method in self.phases[name]:
+                self._patch(owner, method, self._timed(index, getattr(owner, method)))
+        self._patch(gamegraphics.FlightLoop, "step", self._frame(gamegraphics.FlightLoop.step))
+        self.enabled = True
+
+    """ Puts the original methods back """
+    def disable(self):
+        if not self.enabled:
+            return
+        self._endFrame(perf_counter())
+        for owner, method, original in reversed(self._originals):
+            if original is None:
+                delattr(owner, method)
+            else:
+                setattr(owner, method, original)
+        self._originals = []
+        self.enabled = False
+
+    def _patch(self, owner, method, wrapper):
+        # None for methods the owner inherits, those are removed again instead of restored
+        self._originals.append((owner, method, vars(owner).get(method)))
+        setattr(owner, method, wrapper)
+
+    def _timed(self, index, func):
+        profiler = self
+        times = self._times
+        counts = self._counts
+        children = self._children
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            children.append(0.0)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                times[index] += elapsed - children.pop()
+                counts[index] += 1
+                if children:
+                    children[-1] += elapsed
+        timed._frameProfiler = profiler
+        return timed
+
+    def _frame(self, step):
+        profiler = self
+
+        @functools.wraps(step)
+        def frame(loop):
+            now = perf_counter()
+            profiler._endFrame(now)
+            profiler._frameStart = now
+            if loop is not profiler._loop:
+                profiler._loop = loop
+                profiler._loopDropped = loop.droppedFrames
+            moving = step(loop)
+            if not moving:
+                # The last frame of a flight has no pause after it
+                profiler._endFrame(perf_counter())
+            return moving
+        frame._frameProfiler = profiler
+        return frame
+
+    # Stores the frame that started at _frameStart, if there is one, and starts counting from zero
+    def _endFrame(self, now):
+        if self._frameStart is not None:
+            dropped = self._loop.droppedFrames - self._loopDropped
+            self._loopDropped = self._loop.droppedFrames
+            row = (self.frameCount % self.capacity)*len(self.fields)
+            values = [now - self._frameStart] + self._times + self._counts + [dropped]
+            self.frames[row:row+len(values)] = array("d", values)
+            self.frameCount += 1
+            self._frameStart = None
+        for i in range(len(self._times)):
+            self._times[i] = 0.0
+            self._counts[i] = 0
+
+    """ The recorded frames (at most capacity, oldest first), each a dict from field name to value """
+    def getFrames(self):
+        width = len(self.fields)
+        count = min(self.frameCount, self.capacity)
+        first = self.frameCount - count
+        rows = []
+        for n in range(first, self.frameCount):
+            row = (n % self.capacity)*width
+            rows.append(dict(zip(self.fields, self.frames[row:row+width])))
+        return rows
+
+    """
+        A dict with the number of frames, the total number of dropped frames and, for the frame time
+        and every phase, the mean, 95th percentile and maximum over the recorded frames
+    """
+    def summary(self):
+        frames = self.getFrames()
+        result = {"frames": len(frames), "totalFrames": self.frameCount,
+                  "droppedFrames": int(sum(f["dropped"] for f in frames))}
+        for field in self.fields[:-1]:
+            values = sorted(f[field] for f in frames)
+            if values:
+                result[field] = {"mean": sum(values)/len(values),
+                                 "p95": values[min(int(0.95*len(values)), len(values)-1)],
+                                 "max": values[-1]}
+        return result
+
+    """ Writes the summary and, with frames=True, every recorded frame as JSON to a file name or file object """
+    def dump(self, file, frames=False):
+        data = {"summary": self.summary()}
+        if frames:
+            data["frames"] = self.getFrames()
+        if isinstance(file, str):
+            with open(file, "w") as f:
+                json.dump(data, f, indent=1)
+        else:
+            json.dump(data, file, indent=1)
+
+
+if __name__ == "__main__":
+    # Profiles a few headless flights
+    graphics.setHeadless(True)
+    game = gamemodel.Game(10, 3)
+    ggame = gamegraphics.GameGraphics(game)
+    with FrameProfiler() as profiler:
+        for angle, velocity in ((45, 40), (60, 35), (30, 50)):
+            proj = game.getCurrentPlayer().fire(angle, velocity)
+            gamegraphics.FlightLoop(ggame, proj).run()
+            game.nextPlayer()
+    profiler.dump(sys.stdout)
+    print()
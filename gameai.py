@@ -0,0 +1,72 @@
+from time import perf_counter
+
+""" A computer opponent: finds an angle and velocity that hits the other player's cannon """
+
+# Angles tried in order, the first one usually has a bracket that contains a hit
+AIM_ANGLES = (45, 60, 30, 75, 15)
+
+# Smallest velocity interval worth splitting further
+VELOCITY_TOLERANCE = 0.01
+
+"""
+    Returns (angle, velocity) for the current player of the game, in the same form as Player.fire takes them.
+    The landing position is found by root-finding on the velocity for a few fixed angles, using
+    at most maxEvaluations trajectory evaluations and (roughly) at most timeBudget seconds.
+    A hit is decided like finishShot does, i.e. projectileDistance is 0 for a shot stepped with dt.
+    If no hit is found within the budget the closest shot found is returned.
+"""
+def computerAim(game, maxEvaluations=60, timeBudget=0.005, dt=1/50, minVelocity=1, maxVelocity=100):
+    aim = _Aim(game, dt)
+    deadline = perf_counter() + timeBudget
+    evaluations = 0
+    for angle in AIM_ANGLES:
+        if evaluations + 2 > maxEvaluations or perf_counter() > deadline:
+            break
+        vLow, vHigh = minVelocity, maxVelocity
+        gLow = aim.miss(angle, vLow)
+        gHigh = aim.miss(angle, vHigh)
+        evaluations += 2
+        if gLow == 0 or gHigh == 0:
+            break
+        if (gLow > 0) == (gHigh > 0):
+            continue
+
+        # Bisection, the miss distance is 0 on a whole interval so this ends quickly on a hit.
+        # The landing position jumps when the ball starts reaching a wall, in that case the
+        # bracket shrinks without a hit and the next angle is tried.
+        while evaluations < maxEvaluations and perf_counter() <= deadline and vHigh - vLow > VELOCITY_TOLERANCE:
+            v = (vLow + vHigh) / 2.0
+            g = aim.miss(angle, v)
+            evaluations += 1
+            if g == 0:
+                return aim.best()
+            if (g > 0) == (gHigh > 0):
+                vHigh, gHigh = v, g
+            else:
+                vLow, gLow = v, g
+    return aim.best()
+
+
+# Evaluates shots for the current player without changing the state of the game
+class _Aim:
+    def __init__(self, game, dt):
+        self.game = game
+        self.dt = dt
+        self.player = game.getCurrentPlayer()
+        self.target = game.getOtherPlayer()
+        # Misses are measured positive when the ball lands beyond the target
+        self.direction = 1 if self.target.getX() > self.player.getX() else -1
+        self.bestAim = self.player.getAim()
+        self.bestMiss = None
+
+    # Signed miss distance for a shot, 0 is a hit. Goes through Player.landing so the game's landing cache is used
+    def miss(self, angle, velocity):
+        xPos, time = self.player.landing(angle, velocity, self.dt)
+        distance = self.direction*self.target.landingDistance(xPos)
+        if self.bestMiss is None or abs(distance) < abs(self.bestMiss):
+            self.bestAim = angle, velocity
+            self.bestMiss = distance
+        return distance
+
+    def best(self):
+        return self.bestAim
@@ -0,0 +1,180 @@
+import numpy as np
+from gamemodel import TERRAIN_STEP
+
+""" Batch simulation of many projectiles at once, using the same physics as gamemodel.Projectile """
+class BatchProjectiles:
+    """
+        Constructor parameters (scalars or arrays, broadcast to a common length):
+        angle and velocity: the initial angles and velocities of the projectiles
+            angle 0 means straight east (positive x-direction) and 90 straight up
+        wind: The wind speed value affecting each projectile
+        xPos and yPos: The initial positions of the projectiles
+        xLower and xUpper: The lowest and highest x-positions allowed
+        terrain: the ground (a gameterrain.Terrain) shared by all projectiles, None for flat ground at y=0
+    """
+    def __init__(self, angle, velocity, wind, xPos, yPos, xLower, xUpper, terrain=None):
+        angle, velocity, wind, xPos, yPos, xLower, xUpper = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (angle, velocity, wind, xPos, yPos, xLower, xUpper)))
+        theta = np.radians(angle)
+        self.xPos = xPos.copy()
+        self.yPos = yPos.copy()
+        self.xvel = velocity*np.cos(theta)
+        self.yvel = velocity*np.sin(theta)
+        self.wind = wind.copy()
+        self.xLower = xLower.copy()
+        self.xUpper = xUpper.copy()
+        self.ticks = np.zeros(self.xPos.shape, dtype=np.int64)
+        self.terrain = terrain
+
+    """ Builds a batch from existing Projectile objects (their current state is copied), they should share their terrain """
+    @classmethod
+    def fromProjectiles(cls, projectiles):
+        batch = cls(0, 0, 0, np.zeros(len(projectiles)), 0, 0, 0, projectiles[0].terrain if projectiles else None)
+        batch.xPos[:] = [p.xPos for p in projectiles]
+        batch.yPos[:] = [p.yPos for p in projectiles]
+        batch.xvel[:] = [p.xvel for p in projectiles]
+        batch.yvel[:] = [p.yvel for p in projectiles]
+        batch.wind[:] = [p.wind for p in projectiles]
+        batch.xLower[:] = [p.xLower for p in projectiles]
+        batch.xUpper[:] = [p.xUpper for p in projectiles]
+        return batch
+
+    def __len__(self):
+        return self.xPos.shape[0]
+
+    """
+        Advance time by a given number of seconds for every projectile that is still moving.
+        Projectiles that have stopped are left untouched, so repeatedly calling update gives
+        the same result as the usual "while proj.isMoving(): proj.update(time)" loop on each one.
+    """
+    def update(self, time):
+        moving = self.isMoving()
+
+        # Compute new velocity based on acceleration from gravity/wind
+        yvel1 = self.yvel - 9.8*time
+        xvel1 = self.xvel + self.wind*time
+
+        # Move based on the average velocity in the time period, clamped like Projectile.update
+        xPos1 = np.clip(self.xPos + time * (self.xvel + xvel1) / 2.0, self.xLower, self.xUpper)
+        yPos1 = np.maximum(self.yPos + time * (self.yvel + yvel1) / 2.0, self._groundAt(xPos1))
+
+        np.copyto(self.xPos, xPos1, where=moving)
+        np.copyto(self.yPos, yPos1, where=moving)
+        np.copyto(self.xvel, xvel1, where=moving)
+        np.copyto(self.yvel, yvel1, where=moving)
+        self.ticks += moving
+        return moving
+
+    """ A boolean array, True for every projectile that has not hit the ground or a wall (see Projectile.isMoving) """
+    def isMoving(self):
+        return (self._groundAt(self.xPos) < self.yPos) & (self.xLower < self.xPos) & (self.xPos < self.xUpper)
+
+    # The ground heights at the x-positions
+    def _groundAt(self, xPos):
+        return 0 if self.terrain is None else self.terrain.heightsAt(xPos)
+
+    """ Number of projectiles that are still moving """
+    def movingCount(self):
+        return int(np.count_nonzero(self.isMoving()))
+
+    """
+        Steps all projectiles with the given time step until every one of them has stopped
+        (or maxTicks steps have been taken) and returns the array of landing x-positions.
+    """
+    def run(self, time, maxTicks=None):
+        ticks = 0
+        while maxTicks is None or ticks < maxTicks:
+            if not self.update(time).any():
+                break
+            ticks += 1
+        return self.getX()
+
+    """
+        Computes where every projectile stops without stepping, like Projectile.landing() with dt=None.
+        Returns three arrays (time, xPos, hitWall). Projectiles that have already stopped give time 0.
+    """
+    def landing(self):
+        if self.terrain is not None:
+            return self._terrainLanding()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            groundTime = _firstPositiveRoot(-9.8/2.0, self.yvel, self.yPos)
+            wallTime = np.minimum(_firstPositiveRoot(self.wind/2.0, self.xvel, self.xPos - self.xLower),
+                                  _firstPositiveRoot(self.wind/2.0, self.xvel, self.xPos - self.xUpper))
+        moving = self.isMoving()
+        hitWall = np.where(moving, wallTime < groundTime, ~((self.xLower < self.xPos) & (self.xPos < self.xUpper)))
+        time = np.where(moving, np.minimum(groundTime, wallTime), 0.0)
+        xPos = np.clip(self.xPos + self.xvel*time + self.wind*time*time/2.0, self.xLower, self.xUpper)
+        # Put projectiles that stopped at a wall exactly on it
+        xPos = np.where(moving & hitWall,
+                        np.where(xPos < (self.xLower + self.xUpper)/2.0, self.xLower, self.xUpper), xPos)
+        return time, xPos, hitWall
+
+    # landing over terrain: the paths of all projectiles are checked every TERRAIN_STEP seconds at
+    # once, then the impacts are narrowed down by bisection, like Projectile._terrainStop
+    def _terrainLanding(self):
+        def stopped(time):
+            xPos = self.xPos + self.xvel*time + self.wind*time*time/2.0
+            yPos = self.yPos + self.yvel*time - 9.8*time*time/2.0
+            return (xPos <= self.xLower) | (xPos >= self.xUpper) | (yPos <= self.terrain.heightsAt(xPos)), xPos
+
+        moving = self.isMoving()
+        high = np.zeros(self.xPos.shape)
+        searching = moving.copy()
+        ticks = 0
+        while searching.any():
+            ticks += 1
+            stop, xPos = stopped(ticks*TERRAIN_STEP)
+            found = searching & stop
+            high[found] = ticks*TERRAIN_STEP
+            searching &= ~stop
+        low = np.where(moving, np.maximum(high - TERRAIN_STEP, 0), 0)
+        for i in range(60):
+            middle = (low + high)/2.0
+            stop, xPos = stopped(middle)
+            high = np.where(stop, middle, high)
+            low = np.where(stop, low, middle)
+        time = np.where(moving, high, 0.0)
+        xPos = self.xPos + self.xvel*time + self.wind*time*time/2.0
+        hitWall = np.where(moving, (xPos <= self.xLower) | (xPos >= self.xUpper),
+                           ~((self.xLower < self.xPos) & (self.xPos < self.xUpper)))
+        xPos = np.clip(xPos, self.xLower, self.xUpper)
+        xPos = np.where(moving & hitWall,
+                        np.where(xPos < (self.xLower + self.xUpper)/2.0, self.xLower, self.xUpper), xPos)
+        return time, xPos, hitWall
+
+    def getX(self):
+        return self.xPos
+
+    """ The current y-positions (heights) of the projectiles. Never below 0. """
+    def getY(self):
+        return self.yPos
+
+    """ The number of update steps each projectile has taken while moving """
+    def getTicks(self):
+        return self.ticks
+
+
+""" Builds a batch of projectiles fired by a player, the same way Player.fire creates a single one """
+def fireBatch(player, angles, velocities):
+    angles = np.asarray(angles, dtype=float)
+    #when shooting to left (opposite direction)
+    if player.getX() > 0:
+        angles = 180-angles
+    game = player.game
+    xLower, xUpper = game.getArenaBounds()
+    return BatchProjectiles(angles, velocities, game.getCurrentWind(), player.getX(), game.getCannonSize()/2, xLower, xUpper,
+                            game.getTerrain())
+
+
+# The smallest real root t > 0 of a*t^2 + b*t + c = 0 elementwise, inf where there is none
+def _firstPositiveRoot(a, b, c):
+    a, b, c = np.broadcast_arrays(a, b, c)
+    disc = b*b - 4*a*c
+    real = disc >= 0
+    # Numerically stable form of the quadratic formula, q = -b when a is 0
+    q = -(b + np.copysign(np.sqrt(np.where(real, disc, 0)), b))/2.0
+    r1 = np.where(a != 0, q/a, np.inf)
+    r2 = np.where(q != 0, c/q, np.inf)
+    r1 = np.where(real & (r1 > 0), r1, np.inf)
+    r2 = np.where(real & (r2 > 0), r2, np.inf)
+    return np.minimum(r1, r2)
@@ -8,8 +8,12 @@
 #counterparts in the model:
 #  * Button
 #  * InputDialog
+#and FlightLoop, which animates a shot with a fixed physics
+#time step independent of the frame rate.
 #------------------------------------------------------
 
+import time
+
 # This is the only place where graphics should be imported!
 from graphics import *
 
@@ -19,30 +23,49 @@ class GameGraphics:
         
         #create window
         win = GraphWin("Cannon game" , 640, 480, autoflush=False)
-        win.setCoords(-110, -10, 110, 155)
+        xLower, xUpper = game.getArenaBounds()
+        win.setCoords(xLower, -10, xUpper, 155)
         self.w = win
         
-        #draw baseline
-        Line(Point(-110,0), Point(110, 0)).draw(win)
+        #draw baseline, or the terrain if the game has one
+        self.terrain = None
+        if game.getTerrain() is None:
+            Line(Point(xLower,0), Point(xUpper, 0)).draw(win)
+        else:
+            self.terrain = Polygon(self._terrainOutline())
+            self.terrain.setFill("darkolivegreen")
+            self.terrain.setOutline("darkolivegreen")
+            self.terrain.draw(win)
+            self.terrainVersion = game.getTerrain().version
 
         #input dialog
         angle, velocity = game.getCurrentPlayer().getAim()
         wind = game.getCurrentWind()
         self.dialog = InputDialog(angle, velocity, wind)
 
-        #create players
-        self.p1 = PlayerGraphics(game.getCurrentPlayer(), self, angle, velocity)
-        self.p2 = PlayerGraphics(game.getOtherPlayer(), self, angle, velocity)
+        #create players, in the order of game.getPlayers()
+        self.playerGraphics = [PlayerGraphics(player, self, angle, velocity) for player in game.getPlayers()]
         
-    def sync(self):
-        #call sync for 2 playerGrap, refresh the graphic
-        self.p1.sync()
-        self.p2.sync()
+    # ballPos is an (x, y) to draw the current player's ball at instead of
+    # where its projectile is, used to draw positions between physics steps
+    def sync(self, ballPos=None):
+        #call sync for every playerGraphics, refresh the graphic
+        current = self.game.getCurrentPlayer()
+        for playerGraphics in self.playerGraphics:
+            playerGraphics.sync(ballPos if playerGraphics.player is current else None)
+        #reshape the terrain polygon in place when craters have been dug
+        terrain = self.game.getTerrain()
+        if self.terrain is not None and terrain.version != self.terrainVersion:
+            self.terrain.setPoints(self._terrainOutline())
+            self.terrainVersion = terrain.version
         self.dialog.height.setText("{0:.2f}".format(self.game.getCurrentWind()))
 
     def getWindow(self):
         return self.w
 
+    def _terrainOutline(self):
+        return [Point(x, y) for x, y in self.game.getTerrain().getOutline()]
+
 
 class PlayerGraphics:
     def __init__(self, player, ggame, angle, velocity):
@@ -53,6 +76,11 @@ class PlayerGraphics:
         self.angle = angle
         self.velocity = velocity
         self.circle = None
+        # Where the ball was last drawn and the score last shown, so sync only
+        # changes what moved and allocates no Points or strings per frame
+        self.ballX = 0.0
+        self.ballY = 0.0
+        self.score = player.getScore()
         
         #draw cannon
         cannonRadius = ggame.game.getCannonSize() /2
@@ -63,33 +91,128 @@ class PlayerGraphics:
         cannon.draw(self.window)
         
         #draw scoreboard/text
-        self.txt = Text(Point(player.getX(), -5), 'Score: ' + str(player.getScore()))
+        self.txt = Text(Point(player.getX(), -5), 'Score: ' + str(self.score))
         self.txt.draw(self.window)
 
 
-    def sync(self):
+    def sync(self, ballPos=None):
         proj = self.player.getProjectile()
         #check if player has projectile
         if proj is not None:
+            if ballPos is None:
+                ballX = proj.getX()
+                ballY = proj.getY()
+            else:
+                ballX, ballY = ballPos
             #if cannonball don't exits
             if self.circle is None:
                 ballSize = self.ggame.game.getBallSize()
-                circle = Circle(Point(proj.getX(),proj.getY()), ballSize)
+                circle = Circle(Point(ballX,ballY), ballSize)
                 circle.setFill(self.color)
                 circle.setOutline(self.color)
                 self.circle = circle
                 circle.draw(self.window)
-            else:
+                self.ballX = ballX
+                self.ballY = ballY
+            elif ballX != self.ballX or ballY != self.ballY:
             #if cannonball exits, move circle to new location
-                center = self.circle.getCenter()
-                dx = proj.getX()-center.getX()
-                dy = proj.getY()-center.getY()
-                self.circle.move(dx,dy)
+                self.circle.move(ballX-self.ballX, ballY-self.ballY)
+                self.ballX = ballX
+                self.ballY = ballY
 
         #update score text
-        self.txt.setText('Score: ' + str(self.player.getScore()))
+        score = self.player.getScore()
+        if score != self.score:
+            self.txt.setText('Score: ' + str(score))
+            self.score = score
+
+
+
+""" Animates a flying projectile, stepping the physics with a fixed time step and drawing at a separate frame rate """
+class FlightLoop:
+    """
+        ggame: the GameGraphics to draw in, proj: the projectile to animate
+        physicsRate: physics steps per simulated second, frameRate: the highest number of frames drawn per second
+        Physics time follows the wall clock, so a flight takes as long on a slow machine as on a fast one.
+        When drawing falls behind, the physics catches up with several steps and the missed frames are skipped.
+        exact: step with Projectile.advance, so the ball stops exactly at the impact whatever the physics rate
+    """
+    def __init__(self, ggame, proj, physicsRate=50, frameRate=50, exact=False):
+        self.ggame = ggame
+        self.proj = proj
+        self.dt = 1/physicsRate
+        self.exact = exact
+        self.frameRate = frameRate
+        self.accumulator = 0.0
+        self.lastTime = None
+        self.elapsed = 0.0
+        self.prevX, self.prevY = proj.getX(), proj.getY()
+        self.steps = 0
+        self.frames = 0
+        self.droppedFrames = 0
+
+    """ Advances the physics to the current time and draws one frame. Returns True while the projectile is moving """
+    def step(self):
+        now = time.perf_counter()
+        if self.lastTime is None:
+            self.lastTime = now
+        elapsed = now - self.lastTime
+        self.lastTime = now
+        self.elapsed += elapsed
+        self.accumulator += elapsed
+
+        proj = self.proj
+        while self.accumulator >= self.dt and proj.isMoving():
+            self.prevX, self.prevY = proj.getX(), proj.getY()
+            if self.exact:
+                proj.advance(self.dt)
+            else:
+                proj.update(self.dt)
+            self.accumulator -= self.dt
+            self.steps += 1
+
+        moving = proj.isMoving()
+        if moving:
+            # Draw the ball between the last two physics states
+            alpha = self.accumulator / self.dt
+            ballPos = (self.prevX + (proj.getX() - self.prevX)*alpha,
+                       self.prevY + (proj.getY() - self.prevY)*alpha)
+        else:
+            ballPos = proj.getX(), proj.getY()
+        self.ggame.sync(ballPos)
+        self.frames += 1
+        # Frames that should have been drawn by now but weren't
+        self.droppedFrames = max(int(self.elapsed*self.frameRate) + 1 - self.frames, 0)
+        return moving
+
+    """ Animates the projectile until it stops and returns it """
+    def run(self):
+        self.lastTime = time.perf_counter()
+        while self.step():
+            update(self.frameRate)
+        return self.proj
+
+    """ Animates the projectile from the event loop (see graphics.after) without blocking, calls onDone(proj) when it stops """
+    def start(self, onDone):
+        self.lastTime = time.perf_counter()
+        frameTime = 1/self.frameRate
+
+        def tick(due):
+            if not self.step():
+                onDone(self.proj)
+                return
+            # Aim for the next frame time, but never schedule into the past
+            due = max(due + frameTime, time.perf_counter())
+            after(int((due - time.perf_counter())*1000), tick, due)
+        tick(self.lastTime)
+
+    """ Like run, but as a coroutine that lets other asyncio tasks run between frames """
+    async def runAsync(self):
+        self.lastTime = time.perf_counter()
+        while self.step():
+            await asyncUpdate(self.frameRate)
+        return self.proj
 
-        
 
 """ A somewhat specific input dialog class (adapted from the book) """
 class InputDialog:
@@ -114,6 +237,32 @@ class InputDialog:
         self.quit = Button(win, Point(3,4), 1.25, .5, "Quit")
         self.quit.activate()
 
+    """
+        Event-driven alternative to interact: calls onFire() when the Fire button is clicked or Enter is
+        pressed, and onQuit() when the Quit button is clicked. Nothing runs while waiting for input,
+        the calls come from the event loop (see graphics.mainloop).
+    """
+    def listen(self, onFire, onQuit):
+        def clicked(p):
+            # Mouse handlers get window (screen) positions
+            pt = Point(*self.win.toWorld(p.getX(), p.getY()))
+            if self.quit.clicked(pt):
+                onQuit()
+            elif self.fire.clicked(pt):
+                onFire()
+
+        def pressed(key):
+            if key in ("Return", "KP_Enter"):
+                onFire()
+
+        self.win.setMouseHandler(clicked)
+        self.win.setKeyHandler(pressed)
+
+    """ Stops calling the functions given to listen """
+    def stopListening(self):
+        self.win.setMouseHandler(None)
+        self.win.setKeyHandler(None)
+
     """ Waits for the player to enter values and click a button """
     def interact(self):
         while True:
@@ -123,6 +272,15 @@ class InputDialog:
             if self.fire.clicked(pt):
                 return "Fire!"
 
+    """ Like interact, but as a coroutine that waits without blocking the asyncio event loop """
+    async def asyncInteract(self):
+        while True:
+            pt = await self.win.asyncGetMouse()
+            if self.quit.clicked(pt):
+                return "Quit"
+            if self.fire.clicked(pt):
+                return "Fire!"
+
     """ Gets the values entered into this window, typically called after interact """
     def getValues(self):
         a = float(self.angle.getText())
@@ -1,18 +1,44 @@
-from math import dist, sin,cos,radians,copysign
+from math import dist, sin,cos,radians,copysign,sqrt,ceil
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left
 import random
 
+# Colors of the players, in order, for games with more players than colors given
+PLAYER_COLORS = ("blue", "red", "green", "orange", "purple", "brown", "cyan", "magenta", "gold", "gray")
+
 """ This is the model of the game"""
 class Game:
-    def __init__(self, cannonSize, ballSize):
-        p1 = Player(self, "blue", -90)
-        p2 = Player(self, "red", 90)
-        self.players = [p1, p2]
+    """
+        The wind of each round is drawn from rng (a random.Random), or from a new
+        random.Random(seed) if no rng is given. Games with the same seed get the same winds.
+        positions: the x-positions of the players' cannons, the players take turns in this order.
+            Players right of x=0 shoot to the left.
+        colors: the colors of the players, by default taken from PLAYER_COLORS
+        arena: the lowest and highest x-positions a projectile can reach
+    """
+    def __init__(self, cannonSize, ballSize, seed=None, rng=None, positions=(-90, 90), colors=None, arena=(-110, 110)):
+        if colors is None:
+            colors = [PLAYER_COLORS[i % len(PLAYER_COLORS)] for i in range(len(positions))]
+        if len(colors) != len(positions):
+            raise ValueError("there should be one color for each player")
+        if not arena[0] < arena[1]:
+            raise ValueError("the arena needs a lower bound below its upper bound")
+        self.players = [Player(self, color, position) for color, position in zip(colors, positions)]
         self.cannonSize = cannonSize
         self.ballSize = ballSize
         self.wind = 0
         self.currentPlayerIndex = 0
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.arena = tuple(arena)
+        # The cannon positions in increasing order and the players at them, to find hit cannons with a binary search
+        order = sorted(range(len(self.players)), key=lambda i: self.players[i].getX())
+        self.cannonIndex = [self.players[i].getX() for i in order], [self.players[i] for i in order]
+        # No landing cache or terrain unless one is set
+        self.landingCache = None
+        self.terrain = None
 
-    """ A list containing both players """
+    """ A list containing all players, in turn order """
     def getPlayers(self):
         return self.players 
 
@@ -20,14 +46,11 @@ class Game:
     def getCurrentPlayer(self):
         return self.players[self.currentPlayerIndex]
 
-    """ The opponent of the current player """
+    """ The opponent of the current player, with more than two players the one whose turn is next """
     def getOtherPlayer(self):
-        if self.currentPlayerIndex == 0:
-            return self.players[1]
-        else:
-            return self.players[0]
+        return self.players[(self.currentPlayerIndex + 1) % len(self.players)]
 
-    """ The number (0 or 1) of the current player. This should be the position of the current player in getPlayers(). """
+    """ The number (0 for the first) of the current player. This should be the position of the current player in getPlayers(). """
     def getCurrentPlayerNumber(self):
         return self.currentPlayerIndex
 
@@ -47,20 +70,77 @@ class Game:
     def getCurrentWind(self):
         return self.wind
 
-    """ Switch active player """
+    """ The lowest and highest x-positions a projectile can reach, as a tuple """
+    def getArenaBounds(self):
+        return self.arena
+
+    """
+        The player whose cannon a projectile on the ground at x-position xPos touches (i.e. projectileDistance
+        would be 0), or None. The shooter, if given, is never returned. If several cannons are touched the
+        leftmost one is returned. Uses a binary search over the cannon positions.
+    """
+    def getPlayerHit(self, xPos, shooter=None):
+        positions, players = self.cannonIndex
+        reach = self.cannonSize/2 + self.ballSize
+        # Look a little further than the reach, whether a cannon is touched is decided by landingDistance
+        slack = 1e-9*(abs(xPos) + reach)
+        i = bisect_left(positions, xPos - reach - slack)
+        while i < len(positions) and positions[i] <= xPos + reach + slack:
+            player = players[i]
+            if player is not shooter and player.landingDistance(xPos) == 0:
+                return player
+            i += 1
+        return None
+
+    """ Switch active player, players take turns in the order of getPlayers() """
     def nextPlayer(self):
-        if self.currentPlayerIndex == 0:
-            self.currentPlayerIndex = 1
-        else:
-            self.currentPlayerIndex = 0
+        self.currentPlayerIndex = (self.currentPlayerIndex + 1) % len(self.players)
         
     """ Start a new round with a random wind value (-10 to +10) """
     def newRound(self):
-        self.wind = random.random()*20-10
+        self.wind = self.rng.random()*20-10
+
+    """ Use terrain (a gameterrain.Terrain) as the ground of this game, None for flat ground at y=0 """
+    def setTerrain(self, terrain):
+        self.terrain = terrain
+
+    """ The terrain of this game, or None for flat ground """
+    def getTerrain(self):
+        return self.terrain
+
+    """ Memoize the landings of Player.landing in cache (a LandingCache), None turns caching off """
+    def setLandingCache(self, cache):
+        self.landingCache = cache
+
+    """ The LandingCache of this game, or None """
+    def getLandingCache(self):
+        return self.landingCache
+
+    """ The random number generator of this game """
+    def getRandom(self):
+        return self.rng
+
+    """ A snapshot of the random number generator, to be restored with setRandomState """
+    def getRandomState(self):
+        return self.rng.getstate()
+
+    """ Restores the random number generator to a snapshot from getRandomState """
+    def setRandomState(self, state):
+        self.rng.setstate(state)
+
+    """
+        Draws the winds of the next k rounds at once and returns them as an array of floats.
+        These are exactly the values the next k calls of newRound would have given.
+    """
+    def drawWinds(self, k):
+        r = self.rng.random
+        return array("d", [r()*20-10 for i in range(k)])
 
 
 """ Models a player """
 class Player:
+    __slots__ = ("color", "X", "score", "game", "proj", "projAim")
+
     def __init__(self, game, color, position):
         self.color = color
         self.X = position
@@ -77,15 +157,31 @@ class Player:
             angle = 180-angle
         
         self.projAim = angle, velocity
-        wind = self.game.getCurrentWind()
-        xPos = self.X
-        yPos = self.game.getCannonSize()/2
-        xLower = -110
-        xUpper = 110
-        proj = Projectile(angle, velocity, wind, xPos, yPos, xLower, xUpper)
+        proj = self._shot(angle, velocity, self.game.getCurrentWind())
         self.proj = proj
         return proj
 
+    """
+        Where a shot fire(angle, velocity) would stop, without firing it: a tuple (xPos, time).
+        dt is the time step the shot would be stepped with, see Projectile.landing.
+        Uses the landing cache of the game if it has one.
+    """
+    def landing(self, angle, velocity, dt=None):
+        if self.getX() > 0:
+            angle = 180-angle
+        cache = self.game.getLandingCache()
+        if cache is not None:
+            return cache.landing(self, angle, velocity, self.game.getCurrentWind(), dt)
+        time, xPos, hitWall = self._shot(angle, velocity, self.game.getCurrentWind()).landing(dt)
+        return xPos, time
+
+    # A projectile fired from this players cannon, angle already turned for shots to the left
+    def _shot(self, angle, velocity, wind):
+        xPos = self.X
+        yPos = self.game.getCannonSize()/2
+        xLower, xUpper = self.game.getArenaBounds()
+        return Projectile(angle, velocity, wind, xPos, yPos, xLower, xUpper, self.game.getTerrain())
+
     """ Returns the current projectile of this player if there is one, otherwise None """
     def getProjectile(self):
         return self.proj
@@ -93,7 +189,10 @@ class Player:
     """ Gives the x-distance from this players cannon to a projectile. If the cannon and the projectile touch 
     (assuming the projectile is on the ground and factoring in both cannon and projectile size) this method should return 0"""
     def projectileDistance(self, proj):
-        ballX = proj.getX()
+        return self.landingDistance(proj.getX())
+
+    """ Like projectileDistance, for a projectile on the ground at x-position ballX """
+    def landingDistance(self, ballX):
         cannonX = self.getX()
         ballSize = self.game.getBallSize() 
         cannonRadius = self.game.getCannonSize() /2
@@ -155,12 +254,16 @@ class Projectile:
         wind: The wind speed value affecting this projectile
         xPos and yPos: The initial position of this projectile
         xLower and xUpper: The lowest and highest x-positions allowed
+        terrain: the ground (a gameterrain.Terrain), None for flat ground at y=0
     """
-    def __init__(self, angle, velocity, wind, xPos, yPos, xLower, xUpper):
+    __slots__ = ("xPos", "yPos", "xLower", "xUpper", "xvel", "yvel", "wind", "terrain")
+
+    def __init__(self, angle, velocity, wind, xPos, yPos, xLower, xUpper, terrain=None):
         self.yPos = yPos
         self.xPos = xPos
         self.xLower = xLower
         self.xUpper = xUpper
+        self.terrain = terrain
         theta = radians(angle)
         self.xvel = velocity*cos(theta)
         self.yvel = velocity*sin(theta)
@@ -180,8 +283,9 @@ class Projectile:
         self.xPos = self.xPos + time * (self.xvel + xvel1) / 2.0
         self.yPos = self.yPos + time * (self.yvel + yvel1) / 2.0
         
-        # make sure yPos >= 0
-        self.yPos = max(self.yPos, 0)
+        # make sure yPos >= 0 (or the terrain height)
+        terrain = self.terrain
+        self.yPos = max(self.yPos, 0 if terrain is None else terrain.heightAt(self.xPos))
         
         # Make sure xLower <= xPos <= mUpper   
         self.xPos = max(self.xPos, self.xLower)
@@ -193,7 +297,9 @@ class Projectile:
         
     """ A projectile is moving as long as it has not hit the ground or moved outside the xLower and xUpper limits """
     def isMoving(self):
-        return 0 < self.getY() and self.xLower < self.getX() < self.xUpper
+        terrain = self.terrain
+        ground = 0 if terrain is None else terrain.heightAt(self.xPos)
+        return ground < self.getY() and self.xLower < self.getX() < self.xUpper
 
     def getX(self):
         return self.xPos
@@ -201,3 +307,222 @@ class Projectile:
     """ The current y-position (height) of the projectile". Should never be below 0. """
     def getY(self):
         return self.yPos
+
+    """
+        Computes where this projectile stops without stepping it, in constant time.
+        Since gravity and wind are constant the flight is an exact quadratic in time.
+        Over terrain the path has to be searched instead, see _terrainStop.
+        With dt=None the exact (continuous) impact is returned. With a time step dt the result
+        is the one the loop "while proj.isMoving(): proj.update(dt)" would end with.
+        Returns a tuple (time, xPos, hitWall) where hitWall is True if the projectile stopped
+        at xLower or xUpper rather than on the ground.
+    """
+    def landing(self, dt=None):
+        if not self.isMoving():
+            return 0.0, self.xPos, not self.xLower < self.xPos < self.xUpper
+        time, hitWall = self._stop(dt)
+        return time, self._stopX(time, hitWall), hitWall
+
+    """
+        Advance time by a given number of seconds like update, but without clamping: if the projectile
+        hits the ground or a wall during the step it stops exactly at the impact. Any step size gives
+        the exact (continuous) impact, so a single large step can be used.
+        Returns None if the projectile is still moving after the step, otherwise a tuple
+        (time, xPos, hitWall) with the time into the step at which it stopped and where, as landing does.
+    """
+    def advance(self, time):
+        if not self.isMoving():
+            return 0.0, self.xPos, not self.xLower < self.xPos < self.xUpper
+        if self.terrain is not None:
+            # Only search this step for an impact
+            stop = self._terrainStop(None, time)
+            stopTime, hitWall = stop if stop is not None else (float("inf"), False)
+        else:
+            stopTime, hitWall = self._stop(None)
+        if time < stopTime:
+            xPos, yPos = self._positionAt(time)
+            # Just before the impact rounding can put the position past it, then stop right away
+            if 0 < yPos and self.xLower < xPos < self.xUpper:
+                self.xPos = xPos
+                self.yPos = yPos
+                self.xvel = self.xvel + self.wind*time
+                self.yvel = self.yvel - 9.8*time
+                return None
+        self._stopAt(stopTime, hitWall)
+        return stopTime, self.xPos, hitWall
+
+    """ Moves this projectile to where it stops (see landing) and returns the elapsed time """
+    def land(self, dt=None):
+        if not self.isMoving():
+            return 0.0
+        time, hitWall = self._stop(dt)
+        self._stopAt(time, hitWall)
+        return time
+
+    # Moves this projectile to where it stops at the given time
+    def _stopAt(self, time, hitWall):
+        xPos, yPos = self._positionAt(time)
+        self.xPos = self._stopX(time, hitWall)
+        ground = self._groundAt(self.xPos)
+        self.yPos = max(yPos, ground) if hitWall else ground
+        self.xvel = self.xvel + self.wind*time
+        self.yvel = self.yvel - 9.8*time
+
+    def _groundAt(self, xPos):
+        return 0 if self.terrain is None else self.terrain.heightAt(xPos)
+
+    def _positionAt(self, time):
+        xPos = self.xPos + self.xvel*time + self.wind*time*time/2.0
+        yPos = self.yPos + self.yvel*time - 9.8*time*time/2.0
+        return xPos, yPos
+
+    # The x-position at the stop time, exactly on the wall if one was hit
+    def _stopX(self, time, hitWall):
+        xPos, yPos = self._positionAt(time)
+        if hitWall:
+            return self.xLower if xPos < (self.xLower + self.xUpper)/2.0 else self.xUpper
+        return min(max(xPos, self.xLower), self.xUpper)
+
+    # The time at which the projectile stops and whether it stopped at a wall
+    def _stop(self, dt):
+        if self.terrain is not None:
+            return self._terrainStop(dt)
+        groundTimes = _positiveRoots(-9.8/2.0, self.yvel, self.yPos)
+        wallTimes = _positiveRoots(self.wind/2.0, self.xvel, self.xPos - self.xLower)
+        wallTimes += _positiveRoots(self.wind/2.0, self.xvel, self.xPos - self.xUpper)
+        if dt is None:
+            groundTime = min(groundTimes)
+            if wallTimes and min(wallTimes) < groundTime:
+                return min(wallTimes), True
+            return groundTime, False
+
+        # The stop status of the stepping loop can only change at one of the times above,
+        # so the first stopped step is always the first step at or after one of them.
+        candidates = set()
+        for time in groundTimes + wallTimes:
+            ticks = ceil(time/dt)
+            # Allow for rounding in the division
+            candidates.update((ticks-1, ticks, ticks+1))
+        for ticks in sorted(candidates):
+            if ticks < 1:
+                continue
+            xPos, yPos = self._positionAt(ticks*dt)
+            hitWall = xPos <= self.xLower or xPos >= self.xUpper
+            if hitWall or yPos <= 0:
+                return ticks*dt, hitWall
+
+
+    # Whether the projectile would be stopped at a position: at or past a wall, or on or below the ground
+    def _stopped(self, xPos, yPos):
+        return xPos <= self.xLower or xPos >= self.xUpper or yPos <= self.terrain.heightAt(xPos)
+
+    # Like _stop for projectiles over terrain, which has no closed form: the path is checked every step
+    # (dt, or TERRAIN_STEP for the exact impact, which is then found by bisection). With a limit, only
+    # the first limit seconds are searched and None is returned if the projectile is still moving then.
+    def _terrainStop(self, dt, limit=None):
+        step = dt if dt is not None else TERRAIN_STEP
+        ticks = 0
+        while True:
+            ticks += 1
+            time = ticks*step
+            if limit is not None and time >= limit:
+                time = limit
+            xPos, yPos = self._positionAt(time)
+            if self._stopped(xPos, yPos):
+                break
+            if time == limit:
+                return None
+        if dt is None:
+            low, high = max(time - step, 0.0), time
+            for i in range(60):
+                middle = (low + high)/2.0
+                if self._stopped(*self._positionAt(middle)):
+                    high = middle
+                else:
+                    low = middle
+                if high - low <= 1e-12*high:
+                    break
+            time = high
+            xPos, yPos = self._positionAt(time)
+        return time, xPos <= self.xLower or xPos >= self.xUpper
+
+
+# Time step used to search for impacts on terrain, small enough not to jump over narrow hills
+TERRAIN_STEP = 1/200
+
+
+# The real roots t > 0 of a*t^2 + b*t + c = 0
+def _positiveRoots(a, b, c):
+    if a == 0:
+        roots = [-c/b] if b != 0 else []
+    else:
+        disc = b*b - 4*a*c
+        if disc < 0:
+            return []
+        # Numerically stable form of the quadratic formula
+        q = -(b + copysign(sqrt(disc), b))/2.0
+        roots = [q/a]
+        if q != 0:
+            roots.append(c/q)
+    return [t for t in roots if t > 0]
+
+
+""" A bounded cache of shot landings, used by Player.landing when set with Game.setLandingCache """
+class LandingCache:
+    """
+        maxSize: the most landings kept, the least recently used one is dropped first
+        quantum: if given, angles, velocities and winds are rounded to multiples of it, so nearby
+            shots share an entry. The landing returned is then the one of the rounded shot.
+    """
+    def __init__(self, maxSize=4096, quantum=None):
+        self.maxSize = maxSize
+        self.quantum = quantum
+        self.entries = OrderedDict()
+        # The cannon and ball sizes, the arena bounds and the terrain (and its version) the entries were computed for
+        self.geometry = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    """ The landing (xPos, time) of a shot by player, see Player.landing. angle is already turned for shots to the left, as for Player._shot """
+    def landing(self, player, angle, velocity, wind, dt=None):
+        game = player.game
+        terrain = game.getTerrain()
+        geometry = (game.getCannonSize(), game.getBallSize(), game.getArenaBounds(),
+                    terrain, terrain.version if terrain is not None else None)
+        if geometry != self.geometry:
+            # Every entry depends on the sizes
+            self.clear()
+            self.geometry = geometry
+        quantum = self.quantum
+        if quantum:
+            angle = round(angle/quantum)*quantum
+            velocity = round(velocity/quantum)*quantum
+            wind = round(wind/quantum)*quantum
+        key = angle, velocity, wind, player.getX(), dt
+        entries = self.entries
+        result = entries.get(key)
+        if result is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return result
+
+        self.misses += 1
+        time, xPos, hitWall = player._shot(angle, velocity, wind).landing(dt)
+        result = entries[key] = xPos, time
+        if len(entries) > self.maxSize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    """ Drops all entries, the counters are kept """
+    def clear(self):
+        self.entries.clear()
+
+    """ The counters and size of the cache as a dict """
+    def getStats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self.entries), "maxSize": self.maxSize}
+
+    def __len__(self):
+        return len(self.entries)
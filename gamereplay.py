@@ -0,0 +1,152 @@
+import struct
+import numpy as np
+from gamemodel import Game
+
+"""
+    A compact binary log of the turns of a game, and a replayer that rebuilds the Game at any turn.
+
+    A log is a header followed by one 48 byte record per turn, all little-endian:
+      header  magic "CNRP", format version, number of players, cannon size, ball size, wind of the
+              first turn, the time step shots were resolved with, the arena bounds (56 bytes),
+              then the x-position of every player's cannon (8 bytes each)
+      record  the number of the player who fired, whether it was a hit, the angle and velocity given
+              to Player.fire, the wind the shot was fired in, the distance to the next player from
+              projectileDistance (0 for a hit on any cannon) and the wind of the next turn (a new one
+              after a hit)
+    Records are only ever appended, so a log can be read while the game is still being played, and
+    turn n always starts at byte 56 + 8*players + 48*n.
+"""
+
+REPLAY_MAGIC = b"CNRP"
+REPLAY_VERSION = 1
+
+HEADER_FORMAT = struct.Struct("<4sHHdddddd")
+POSITION_FORMAT = struct.Struct("<d")
+RECORD_FORMAT = struct.Struct("<BB6xddddd")
+
+# The same record layout for reading many records at once
+RECORD_DTYPE = np.dtype([("player", "u1"), ("hit", "u1"), ("padding", "V6"), ("angle", "<f8"),
+                         ("velocity", "<f8"), ("wind", "<f8"), ("distance", "<f8"), ("nextWind", "<f8")])
+
+assert RECORD_DTYPE.itemsize == RECORD_FORMAT.size
+
+
+class ReplayError(Exception):
+    pass
+
+
+""" Appends the turns of a game to a binary file object (opened with "wb" or "ab") """
+class ReplayRecorder:
+    """
+        Writes the header, so create the recorder before the first shot.
+        dt: the time step the shots are resolved or animated with, see Projectile.land
+    """
+    def __init__(self, file, game, dt=1/50):
+        self.file = file
+        self.game = game
+        self.wind = game.getCurrentWind()
+        self.turns = 0
+        players = game.getPlayers()
+        xLower, xUpper = game.getArenaBounds()
+        file.write(HEADER_FORMAT.pack(REPLAY_MAGIC, REPLAY_VERSION, len(players), game.getCannonSize(),
+                                      game.getBallSize(), self.wind, dt, xLower, xUpper))
+        file.write(b"".join(POSITION_FORMAT.pack(player.getX()) for player in players))
+
+    """
+        Records a finished turn: call it after the score, wind and current player have been updated
+        (e.g. after finishShot). player is the number of the player who fired, angle and velocity what
+        was given to fire, distance the result of projectileDistance for the shot.
+    """
+    def record(self, player, angle, velocity, distance):
+        nextWind = self.game.getCurrentWind()
+        self.file.write(RECORD_FORMAT.pack(player, distance == 0, angle, velocity, self.wind, distance, nextWind))
+        self.wind = nextWind
+        self.turns += 1
+
+    """ The wind changed outside of a turn (setCurrentWind or newRound), the next turn is recorded with it """
+    def windChanged(self):
+        self.wind = self.game.getCurrentWind()
+
+    def flush(self):
+        self.file.flush()
+
+
+""" A recorded game, rebuilt from a log without simulating the flights """
+class Replay:
+    """ data: the contents of a log, bytes or anything else with the buffer protocol (e.g. an mmap) """
+    def __init__(self, data):
+        data = memoryview(data).cast("B")
+        if len(data) < HEADER_FORMAT.size:
+            raise ReplayError("replay log is too short for its header")
+        (magic, version, playerCount, self.cannonSize, self.ballSize, self.startWind, self.dt,
+         xLower, xUpper) = HEADER_FORMAT.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ReplayError("not a replay log")
+        if version != REPLAY_VERSION:
+            raise ReplayError("unsupported replay log version {}".format(version))
+        headerSize = HEADER_FORMAT.size + POSITION_FORMAT.size*playerCount
+        if len(data) < headerSize:
+            raise ReplayError("replay log is too short for its header")
+        self.positions = tuple(POSITION_FORMAT.unpack_from(data, HEADER_FORMAT.size + POSITION_FORMAT.size*i)[0]
+                               for i in range(playerCount))
+        self.arena = (xLower, xUpper)
+        # A record still being written is ignored
+        count = (len(data) - headerSize) // RECORD_FORMAT.size
+        self.records = np.frombuffer(data, RECORD_DTYPE, count, headerSize)
+
+        # Running totals so the state at any turn is a lookup
+        hits = self.records["hit"].astype(bool)
+        zero = np.zeros(1, dtype=np.int64)
+        players = range(len(self.positions))
+        self._scores = [np.concatenate([zero, np.cumsum(hits & (self.records["player"] == p))]) for p in players]
+        self._winds = np.concatenate([[self.startWind], self.records["nextWind"]])
+        # The last turn each player fired in before turn n, -1 if none
+        turns = np.arange(count)
+        self._lastShots = [np.concatenate([[-1], np.maximum.accumulate(np.where(self.records["player"] == p, turns, -1))])
+                           for p in players]
+
+    """ Reads a log file """
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls(file.read())
+
+    """ The number of recorded turns """
+    def __len__(self):
+        return len(self.records)
+
+    """ Turn n as a tuple (player, hit, angle, velocity, wind, distance) """
+    def getTurn(self, n):
+        record = self.records[n]
+        return (int(record["player"]), bool(record["hit"]), float(record["angle"]), float(record["velocity"]),
+                float(record["wind"]), float(record["distance"]))
+
+    """ The scores of the players before turn n, len(self) gives the final scores """
+    def getScores(self, n):
+        return tuple(int(scores[n]) for scores in self._scores)
+
+    """
+        A Game in the state it was in before turn n (0 for the start, len(self) for the end): scores,
+        current player and wind. The last shot of each player before turn n is fired again so their
+        aims and projectiles are restored too, no earlier shot is simulated. The players get the
+        default colors.
+        The log doesn't hold the state of the game's random generator, so the rebuilt game gets a new
+        unseeded one: rounds played on from it are given other winds than in the recorded game.
+    """
+    def gameAt(self, n):
+        if not 0 <= n <= len(self):
+            raise IndexError("turn {} is outside the replay (0 to {})".format(n, len(self)))
+        game = Game(self.cannonSize, self.ballSize, positions=self.positions, arena=self.arena)
+        players = game.getPlayers()
+        for number, player in enumerate(players):
+            player.score = int(self._scores[number][n])
+            lastShot = self._lastShots[number][n]
+            if lastShot >= 0:
+                last = self.records[lastShot]
+                game.setCurrentWind(float(last["wind"]))
+                player.fire(float(last["angle"]), float(last["velocity"])).land(self.dt)
+        if n > 0:
+            game.currentPlayerIndex = int(self.records["player"][n-1])
+            game.nextPlayer()
+        game.setCurrentWind(float(self._winds[n]))
+        return game
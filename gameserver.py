@@ -0,0 +1,256 @@
+import sys
+import math
+import time
+import random
+import struct
+import asyncio
+import argparse
+from gamemodel import Game
+
+"""
+    An asyncio TCP server hosting many cannon games at once, and a load-test client for it.
+
+    Every connection is one session with its own Game, played hot-seat: the client fires for whichever
+    player's turn it is. Shots are resolved with the closed-form Projectile.land, which gives the same
+    result as animating them with the time step dt.
+
+    Messages are fixed-size little-endian structs that start with a type byte:
+      client -> server  FIRE   angle, velocity (float64)
+                        QUIT   (no payload), the server closes the session
+      server -> client  STATE  current player, wind, both scores (uint32); sent when the session starts
+                        RESULT shooter, hit, landing x, flight time, distance to the target,
+                               then the state after the shot (current player, wind, scores)
+                        ERROR  an error code, sent before the server closes the session
+"""
+
+FIRE = 1
+QUIT = 2
+STATE = 16
+RESULT = 17
+ERROR = 31
+
+FIRE_FORMAT = struct.Struct("<Bdd")
+STATE_FORMAT = struct.Struct("<BBdII")
+RESULT_FORMAT = struct.Struct("<BBBdddBdII")
+ERROR_FORMAT = struct.Struct("<BB")
+
+# Error codes
+ERROR_UNKNOWN_MESSAGE = 1
+ERROR_BAD_SHOT = 2
+ERROR_SERVER_FULL = 3
+
+# Largest velocity accepted from clients, faster shots only hit the walls anyway
+MAX_VELOCITY = 1000.0
+
+
+""" The state of one connection: its game and the number of shots fired so far """
+class Session:
+    def __init__(self, seed=None, dt=1/50):
+        self.game = Game(10, 3, seed)
+        self.game.newRound()
+        self.dt = dt
+        self.shots = 0
+
+    """ The STATE message for the current state of the game """
+    def state(self):
+        game = self.game
+        p1, p2 = game.getPlayers()
+        return STATE_FORMAT.pack(STATE, game.getCurrentPlayerNumber(), game.getCurrentWind(),
+                                 p1.getScore(), p2.getScore())
+
+    """ Fires a shot for the current player and returns the RESULT message, like finishShot in main """
+    def fire(self, angle, velocity):
+        game = self.game
+        shooter = game.getCurrentPlayerNumber()
+        player = game.getCurrentPlayer()
+        other = game.getOtherPlayer()
+        proj = player.fire(angle, velocity)
+        flightTime = proj.land(self.dt)
+        self.shots += 1
+
+        # A hit on any cannon but the shooter's scores, misses are measured to the next player
+        distance = 0.0 if game.getPlayerHit(proj.getX(), player) is not None else other.projectileDistance(proj)
+        if distance == 0:
+            player.increaseScore()
+            game.newRound()
+        game.nextPlayer()
+
+        p1, p2 = game.getPlayers()
+        return RESULT_FORMAT.pack(RESULT, shooter, distance == 0, proj.getX(), flightTime, distance,
+                                  game.getCurrentPlayerNumber(), game.getCurrentWind(),
+                                  p1.getScore(), p2.getScore())
+
+
+class GameServer:
+    """
+        maxSessions: connections beyond this many get ERROR_SERVER_FULL and are closed
+        seed: sessions are seeded with "seed:number" so a run can be repeated, None for random games
+        dt: the time step shots are resolved with
+    """
+    def __init__(self, maxSessions=10000, seed=None, dt=1/50):
+        self.maxSessions = maxSessions
+        self.seed = seed
+        self.dt = dt
+        self.sessions = 0
+        self.sessionCount = 0
+        self.shots = 0
+        self.server = None
+        # The tasks running sessions, so close can wait for them
+        self.handlers = set()
+
+    """ Starts listening, port 0 picks a free port (see getPort) """
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        return self
+
+    """ The port the server listens on """
+    def getPort(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serveForever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    """ Stops listening and waits for the running sessions to end """
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        if self.handlers:
+            await asyncio.wait(self.handlers)
+
+    """ Runs one session. Reads the next message only after the result of the last one has been written """
+    async def handle(self, reader, writer):
+        if self.sessions >= self.maxSessions:
+            writer.write(ERROR_FORMAT.pack(ERROR, ERROR_SERVER_FULL))
+            await self._close(writer)
+            return
+        self.sessions += 1
+        self.sessionCount += 1
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        seed = None if self.seed is None else "{}:{}".format(self.seed, self.sessionCount)
+        session = Session(seed, self.dt)
+        try:
+            writer.write(session.state())
+            await writer.drain()
+            while True:
+                messageType = (await reader.readexactly(1))[0]
+                if messageType == QUIT:
+                    break
+                if messageType != FIRE:
+                    writer.write(ERROR_FORMAT.pack(ERROR, ERROR_UNKNOWN_MESSAGE))
+                    break
+                message = bytes([messageType]) + await reader.readexactly(FIRE_FORMAT.size - 1)
+                _, angle, velocity = FIRE_FORMAT.unpack(message)
+                if not (math.isfinite(angle) and 0 <= velocity <= MAX_VELOCITY):
+                    writer.write(ERROR_FORMAT.pack(ERROR, ERROR_BAD_SHOT))
+                    break
+                writer.write(session.fire(angle, velocity))
+                self.shots += 1
+                # Backpressure: a client that doesn't read its results stops being served
+                # until it does, instead of results piling up in memory
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.sessions -= 1
+            await self._close(writer)
+            self.handlers.discard(task)
+
+    async def _close(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+""" Plays turns shots over one connection with random aims, appending the latency of each turn (in seconds) to latencies """
+async def _loadSession(host, port, turns, rng, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        message = await reader.readexactly(STATE_FORMAT.size)
+        if message[0] != STATE:
+            raise ConnectionError("expected a STATE message, got type {}".format(message[0]))
+        for turn in range(turns):
+            start = time.perf_counter()
+            writer.write(FIRE_FORMAT.pack(FIRE, rng.uniform(10, 80), rng.uniform(10, 80)))
+            result = await reader.readexactly(RESULT_FORMAT.size)
+            latencies.append(time.perf_counter() - start)
+            if result[0] != RESULT:
+                raise ConnectionError("expected a RESULT message, got type {}".format(result[0]))
+        writer.write(bytes([QUIT]))
+        await writer.drain()
+        # Wait for the server to close the session
+        await reader.read()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+""" The value below which the fraction q of the sorted values fall """
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    return values[min(int(q*len(values)), len(values) - 1)]
+
+
+"""
+    Opens sessions connections to the server at host:port at the same time, plays turns shots in each,
+    and returns a dict with the turn latency percentiles (in milliseconds) and the throughput.
+    Without a port a server is started in this process for the test.
+"""
+async def loadTest(host="127.0.0.1", port=None, sessions=1000, turns=20, seed=0):
+    server = None
+    if port is None:
+        server = await GameServer(maxSessions=sessions, seed=seed).start(host)
+        port = server.getPort()
+    latencies = []
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(_loadSession(host, port, turns, random.Random("{}:{}".format(seed, i)), latencies)
+                                         for i in range(sessions)), return_exceptions=True)
+    finally:
+        if server is not None:
+            await server.close()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    failed = sum(1 for r in results if isinstance(r, BaseException))
+    return {"sessions": sessions, "failedSessions": failed, "turns": len(latencies), "seconds": elapsed,
+            "turnsPerSecond": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "p50ms": _percentile(latencies, 0.50)*1000, "p99ms": _percentile(latencies, 0.99)*1000,
+            "maxms": _percentile(latencies, 1.0)*1000}
+
+
+async def _serve(host, port, maxSessions, seed):
+    server = await GameServer(maxSessions, seed).start(host, port)
+    print("Serving cannon games on {}:{}".format(host, server.getPort()))
+    await server.serveForever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cannon game server and load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the game server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5555)
+    serve.add_argument("--max-sessions", type=int, default=10000)
+    serve.add_argument("--seed", default=None)
+    load = commands.add_parser("loadtest", help="measure turn latency with many simultaneous sessions")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=None, help="server to test, by default one is started in this process")
+    load.add_argument("--sessions", type=int, default=1000)
+    load.add_argument("--turns", type=int, default=20)
+    load.add_argument("--seed", default="0")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(_serve(args.host, args.port, args.max_sessions, args.seed))
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(loadTest(args.host, args.port, args.sessions, args.turns, args.seed))
+        print("{sessions} sessions ({failedSessions} failed), {turns} turns in {seconds:.2f}s ({turnsPerSecond:.0f} turns/s)".format(**report))
+        print("turn latency p50 {p50ms:.2f} ms, p99 {p99ms:.2f} ms, max {maxms:.2f} ms".format(**report))
+        sys.exit(1 if report["failedSessions"] else 0)
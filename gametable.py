@@ -0,0 +1,167 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from gamebatch import BatchProjectiles
+
+""" A precomputed table of landing positions over angle x velocity x wind, shared between processes through a memory-mapped file """
+
+# Bump when the file layout or the physics changes, so old files are not used
+TABLE_VERSION = 1
+
+# Where table files are kept unless a directory is given
+DEFAULT_CACHE_DIR = os.environ.get("CANNON_TABLE_DIR") or os.path.join(tempfile.gettempdir(), "cannon-tables")
+
+# Tables already opened by this process, by file name
+_openTables = {}
+
+
+class LandingTable:
+    """
+        Constructor parameters:
+        cannonSize and ballSize: as in Game, the shots start at half the cannon size
+        xPos: the x-position the shots are fired from
+        xLower and xUpper: The lowest and highest x-positions allowed
+        angles, velocities and winds: the grid axes as (first, last, count)
+        cacheDir: directory of the table files, the table is built and saved there if it is missing
+    """
+    def __init__(self, cannonSize, ballSize, xPos=-90, xLower=-110, xUpper=110,
+                 angles=(0, 90, 91), velocities=(0, 100, 101), winds=(-10, 10, 41), cacheDir=None):
+        self.cannonSize = cannonSize
+        self.ballSize = ballSize
+        self.xPos = xPos
+        self.xLower = xLower
+        self.xUpper = xUpper
+        self.axes = tuple((float(first), float(last), int(count)) for first, last, count in (angles, velocities, winds))
+        for first, last, count in self.axes:
+            if count < 2 or last <= first:
+                raise ValueError("a table axis needs at least two increasing values")
+        self.path = os.path.join(cacheDir or DEFAULT_CACHE_DIR, "landing-{}.npy".format(self._key()))
+
+        data = _openTables.get(self.path)
+        if data is None:
+            if not os.path.exists(self.path):
+                self._build()
+            data = np.load(self.path, mmap_mode="r")
+            _openTables[self.path] = data
+        self.data = data
+        na, nv, nw = self.data.shape[1:]
+        self._landing = self.data[0].reshape(-1)
+        self._error = self.data[1].reshape(-1)
+        self._strides = nv*nw, nw, 1
+
+    """ The table for shots fired by a player, using the current cannon size, ball size and arena of its game """
+    @classmethod
+    def forPlayer(cls, player, **grid):
+        game = player.game
+        if game.getTerrain() is not None:
+            raise ValueError("landing tables are only computed for flat ground")
+        xLower, xUpper = game.getArenaBounds()
+        if player.getX() > 0:
+            # Shots to the left are mirror images of shots to the right with the opposite wind
+            table = cls(game.getCannonSize(), game.getBallSize(), -player.getX(), -xUpper, -xLower, **grid)
+            table.mirror = -1
+        else:
+            table = cls(game.getCannonSize(), game.getBallSize(), player.getX(), xLower, xUpper, **grid)
+        return table
+
+    # 1 for shots to the right, -1 for mirrored shots to the left
+    mirror = 1
+
+    """
+        The landing x-position for a shot with the given angle (as Player.fire takes it), velocity and wind,
+        interpolated from the table. Returns a tuple (xPos, errorBound) where errorBound is the largest
+        difference to the exact landing position measured in the grid cell that contains the shot.
+    """
+    def landingX(self, angle, velocity, wind):
+        base = 0
+        fractions = []
+        for value, (first, last, count), stride in zip((angle, velocity, wind*self.mirror), self.axes, self._strides):
+            u = (value - first) / (last - first) * (count - 1)
+            if not 0 <= u <= count - 1:
+                raise ValueError("{} is outside the table range [{}, {}]".format(value, first, last))
+            i = min(int(u), count - 2)
+            base += i*stride
+            fractions.append(u - i)
+        fa, fv, fw = fractions
+        sa, sv, sw = self._strides
+        item = self._landing.item
+        x = ((1-fa)*((1-fv)*((1-fw)*item(base) + fw*item(base+sw))
+                     + fv*((1-fw)*item(base+sv) + fw*item(base+sv+sw)))
+             + fa*((1-fv)*((1-fw)*item(base+sa) + fw*item(base+sa+sw))
+                   + fv*((1-fw)*item(base+sa+sv) + fw*item(base+sa+sv+sw))))
+        return self.mirror*x, self._error.item(base)
+
+    """ Like landingX for arrays of shots, returns two arrays (xPos, errorBound) """
+    def landingXs(self, angles, velocities, winds):
+        winds = np.asarray(winds, dtype=float)*self.mirror
+        angles, velocities, winds = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (angles, velocities, winds)))
+        base = np.zeros(angles.shape, dtype=np.intp)
+        fractions = []
+        for values, (first, last, count), stride in zip((angles, velocities, winds), self.axes, self._strides):
+            u = (values - first) / (last - first) * (count - 1)
+            if not np.all((0 <= u) & (u <= count - 1)):
+                raise ValueError("values outside the table range [{}, {}]".format(first, last))
+            i = np.minimum(u.astype(np.intp), count - 2)
+            base += i*stride
+            fractions.append(u - i)
+        x = np.zeros(angles.shape)
+        for corner in range(8):
+            weight = np.ones(angles.shape)
+            offset = 0
+            for axis in range(3):
+                if corner >> axis & 1:
+                    weight *= fractions[axis]
+                    offset += self._strides[axis]
+                else:
+                    weight *= 1 - fractions[axis]
+            x += weight*self._landing[base + offset]
+        return self.mirror*x, self._error[base]
+
+    # Identifies everything the table contents depend on
+    def _key(self):
+        description = repr((TABLE_VERSION, self.cannonSize, self.ballSize, self.xPos, self.xLower, self.xUpper, self.axes))
+        return hashlib.sha1(description.encode()).hexdigest()[:16]
+
+    # Exact landing positions, and whether they hit a wall, for all combinations of the given axis values
+    def _exact(self, angles, velocities, winds):
+        a, v, w = np.meshgrid(angles, velocities, winds, indexing="ij")
+        batch = BatchProjectiles(a, v, w, self.xPos, self.cannonSize/2, self.xLower, self.xUpper)
+        time, xPos, hitWall = batch.landing()
+        return xPos.reshape(a.shape), hitWall.reshape(a.shape)
+
+    # Computes the table and writes it to its file. The file is written under a temporary
+    # name first so other processes never map a half-written table.
+    def _build(self):
+        points = [np.linspace(first, last, count) for first, last, count in self.axes]
+        landing, hitWall = self._exact(*points)
+        centreLanding, centreHitWall = self._exact(*[(p[:-1] + p[1:]) / 2 for p in points])
+        corners = [(slice(i, i+landing.shape[0]-1), slice(j, j+landing.shape[1]-1), slice(k, k+landing.shape[2]-1))
+                   for i in (0, 1) for j in (0, 1) for k in (0, 1)]
+
+        # Where the landing position is smooth the error of multilinear interpolation is at most
+        # 1/8 of the second differences along each axis, taken at the worst corner of the cell and
+        # doubled to allow for the curvature changing inside the cell. The landing position jumps
+        # where shots start or stop reaching a wall, in those cells the bound is the whole spread of values.
+        error = np.abs(centreLanding - sum(landing[c] for c in corners) / 8)
+        for axis in range(3):
+            curvature = np.abs(np.diff(landing, 2, axis=axis))
+            curvature = np.concatenate([curvature.take([0], axis), curvature, curvature.take([-1], axis)], axis)
+            error = error + np.maximum.reduce([curvature[c] for c in corners]) / 4
+        jumps = np.zeros(centreHitWall.shape, dtype=bool)
+        highest = lowest = centreLanding
+        for c in corners:
+            jumps |= hitWall[c] != centreHitWall
+            highest = np.maximum(highest, landing[c])
+            lowest = np.minimum(lowest, landing[c])
+        error = np.where(jumps, np.maximum(error, highest - lowest), error)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = "{}.{}.tmp".format(self.path, os.getpid())
+        data = np.lib.format.open_memmap(temporary, mode="w+", dtype=np.float64, shape=(2,) + landing.shape)
+        data[0] = landing
+        data[1] = 0
+        data[1, :-1, :-1, :-1] = error
+        data.flush()
+        del data
+        os.replace(temporary, self.path)
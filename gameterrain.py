@@ -0,0 +1,107 @@
+import math
+import numpy as np
+
+"""
+    Hilly, destructible terrain for the cannon game, stored as an array of ground heights.
+
+    The heights are sampled every spacing units from xLower to xUpper and the ground between two
+    samples is a straight line, so the height at any x is found from two array elements whatever the
+    width of the terrain. Set it on a game with Game.setTerrain, projectiles of that game then stop
+    where they reach the ground instead of at y=0.
+"""
+
+class Terrain:
+    """
+        xLower and xUpper: the x-range covered, usually the arena bounds of the game
+        heights: the ground heights at xLower, xLower+spacing, ..., xUpper (by default all 0)
+        spacing: the largest distance between two samples. If it doesn't divide the x-range it is made
+            a little smaller so that it does, the last sample is always at xUpper.
+    """
+    def __init__(self, xLower, xUpper, heights=None, spacing=1.0):
+        self.xLower = float(xLower)
+        self.xUpper = float(xUpper)
+        if not self.xLower < self.xUpper or spacing <= 0:
+            raise ValueError("terrain needs xLower below xUpper and a positive spacing")
+        count = int(math.ceil((self.xUpper - self.xLower) / spacing - 1e-9)) + 1
+        self.spacing = (self.xUpper - self.xLower) / (count - 1)
+        if heights is None:
+            heights = np.zeros(count)
+        self.heights = np.array(heights, dtype=float)
+        if self.heights.shape != (count,):
+            raise ValueError("terrain from {} to {} with spacing {} needs {} heights".format(xLower, xUpper, self.spacing, count))
+        if (self.heights < 0).any():
+            raise ValueError("terrain heights can't be below 0")
+        # Increased by every change, so users can tell when to redraw or recompute
+        self.version = 0
+
+    """
+        Random hills for a game: the sum of a few waves at most maxHeight high, flat at y=0 under
+        every cannon so the cannons stand on the ground. Drawn from rng, by default the game's
+        random generator.
+    """
+    @classmethod
+    def hills(cls, game, maxHeight=30, spacing=1.0, rng=None):
+        rng = rng or game.getRandom()
+        xLower, xUpper = game.getArenaBounds()
+        terrain = cls(xLower, xUpper, spacing=spacing)
+        xs = terrain.getXs()
+        width = xUpper - xLower
+        heights = np.zeros(len(xs))
+        for wave in range(4):
+            length = width / rng.uniform(1, 4 + 2*wave)
+            heights += rng.uniform(0.3, 1) / (wave + 1) * np.sin(2*math.pi*xs/length + rng.uniform(0, 2*math.pi))
+        heights -= heights.min()
+        if heights.max() > 0:
+            heights *= maxHeight / heights.max()
+        # Flat pads under the cannons, sloping up to the hills
+        padWidth = game.getCannonSize()
+        for player in game.getPlayers():
+            distance = np.abs(xs - player.getX())
+            heights = np.minimum(heights, np.maximum(distance - padWidth, 0) * maxHeight / padWidth)
+        terrain.heights[:] = heights
+        return terrain
+
+    """ The x-positions of the height samples """
+    def getXs(self):
+        return np.linspace(self.xLower, self.xUpper, len(self.heights))
+
+    """ The ground height at x-position x, positions outside the terrain get the height at its edge """
+    def heightAt(self, x):
+        u = (x - self.xLower) / self.spacing
+        last = len(self.heights) - 1
+        if u <= 0:
+            return self.heights.item(0)
+        if u >= last:
+            return self.heights.item(last)
+        i = int(u)
+        f = u - i
+        item = self.heights.item
+        return (1 - f)*item(i) + f*item(i + 1)
+
+    """ heightAt for an array of x-positions """
+    def heightsAt(self, xs):
+        u = (np.asarray(xs, dtype=float) - self.xLower) / self.spacing
+        last = len(self.heights) - 1
+        i = np.clip(np.floor(u), 0, max(last - 1, 0)).astype(np.intp)
+        f = np.clip(u - i, 0, 1)
+        return (1 - f)*self.heights[i] + f*self.heights[np.minimum(i + 1, last)]
+
+    """ Digs a round crater of the given radius centred on the ground at x-position x """
+    def carve(self, x, radius):
+        centreY = self.heightAt(x)
+        first = max(int(math.ceil((x - radius - self.xLower) / self.spacing)), 0)
+        last = min(int(math.floor((x + radius - self.xLower) / self.spacing)), len(self.heights) - 1)
+        if first > last:
+            return
+        dx = self.xLower + self.spacing*np.arange(first, last + 1) - x
+        bottom = centreY - np.sqrt(np.maximum(radius*radius - dx*dx, 0))
+        section = self.heights[first:last + 1]
+        np.minimum(section, np.maximum(bottom, 0), out=section)
+        self.version += 1
+
+    """ The outline of the terrain as a list of (x, y) points, closed along y=0 so it can be drawn as a polygon """
+    def getOutline(self):
+        points = [(self.xLower, 0.0)]
+        points.extend(zip(self.getXs().tolist(), self.heights.tolist()))
+        points.append((self.xUpper, 0.0))
+        return points
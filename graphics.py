@@ -10,7 +10,16 @@ LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 
 PLATFORMS: The package is a wrapper around Tkinter and should run on
-any platform where Tkinter is available.
+any platform where Tkinter is available. The Tk root is created when
+the first window is opened, so importing the module needs no display.
+Calling setHeadless() (or setting the GRAPHICS_HEADLESS environment
+variable) makes windows draw into an in-memory canvas model instead,
+for batch jobs and servers without a display.
+
+ASYNCIO: Programs running an asyncio event loop can use asyncUpdate,
+GraphWin.asyncGetMouse and GraphWin.asyncGetKey instead of the blocking
+update, getMouse and getKey. Tk events are then processed by a task
+on the asyncio loop (see startAsyncPump), so no threads are needed.
 
 INSTALLATION: Put this file somewhere where Python can see it.
 
@@ -53,7 +62,8 @@ support moving and hiding for animation effects.
 The library also provides a very simple class for pixel-based image
 manipulation, Pixmap. A pixmap can be loaded from a file and displayed
 using an Image object. Both getPixel and setPixel methods are provided
-for manipulating the image.
+for manipulating the image, and getPixels, setPixels and fill work on
+many pixels at once.
 
 DOCUMENTATION: For complete documentation, see Chapter 4 of "Python
 Programming: An Introduction to Computer Science" by John Zelle,
@@ -160,7 +170,7 @@ __version__ = "5.0"
 #     Added ability to set text atttributes.
 #     Added Entry boxes.
 
-import time, os, sys
+import time, os, sys, heapq, asyncio
 
 try:  # import as appropriate for 2.x vs. 3.x
    import tkinter as tk
@@ -182,23 +192,150 @@ BAD_OPTION = "Illegal option value"
 ##########################################################################
 # global variables and funtions
 
-_root = tk.Tk()
-_root.withdraw()
+# The Tk root is only created when the first window needs it (or update()
+# is called), so programs that never open a window don't need a display.
+_root = None
+
+# In headless mode windows are kept in memory and no Tk root is ever created.
+_headless = os.environ.get("GRAPHICS_HEADLESS", "") not in ("", "0")
+
+def _getRoot():
+    global _root
+    if _root is None:
+        _root = tk.Tk()
+        _root.withdraw()
+        # MacOS fix 1
+        _root.update()
+    return _root
+
+def _updateRoot():
+    # Processes pending Tk events, if there is a Tk root at all
+    if _root is not None:
+        _root.update()
+
+def setHeadless(headless=True):
+    """Turn headless mode on or off. Windows created in headless mode
+    draw into an in-memory canvas model instead of a Tk canvas."""
+    global _headless
+    _headless = headless
+
+def isHeadless():
+    return _headless
 
 _update_lasttime = time.time()
 
-def update(rate=None):
+def _ratePause(rate):
+    # Seconds to pause so that updates happen at most rate times per second
     global _update_lasttime
+    now = time.time()
+    pauseLength = 1/rate-(now-_update_lasttime)
+    if pauseLength > 0:
+        _update_lasttime = now + pauseLength
+        return pauseLength
+    _update_lasttime = now
+    return 0
+
+def update(rate=None):
     if rate:
-        now = time.time()
-        pauseLength = 1/rate-(now-_update_lasttime)
+        pauseLength = _ratePause(rate)
         if pauseLength > 0:
             time.sleep(pauseLength)
-            _update_lasttime = now + pauseLength
-        else:
-            _update_lasttime = now
 
-    _root.update()
+    if _headless:
+        _updateRoot()
+    else:
+        _getRoot().update()
+
+async def asyncUpdate(rate=None):
+    """Like update, but pauses with asyncio.sleep so other coroutines
+    run in the meantime. Always gives them a chance to run, even
+    without a rate."""
+    await asyncio.sleep(_ratePause(rate) if rate else 0)
+    if _headless:
+        _updateRoot()
+    else:
+        _getRoot().update()
+
+# The task that processes Tk events for the running asyncio loop
+_pumpTask = None
+
+async def _pump(interval):
+    while True:
+        _updateRoot()
+        await asyncio.sleep(interval)
+
+def startAsyncPump(interval=0.01):
+    """Process Tk events every interval seconds from a task on the
+    running asyncio event loop, so windows stay responsive and clicks
+    and key presses reach asyncGetMouse and asyncGetKey. Started by
+    those methods if needed. Returns the task."""
+    global _pumpTask
+    loop = asyncio.get_running_loop()
+    if _pumpTask is None or _pumpTask.done() or _pumpTask.get_loop() is not loop:
+        _pumpTask = loop.create_task(_pump(interval))
+    return _pumpTask
+
+def stopAsyncPump():
+    """Stop the task started by startAsyncPump"""
+    global _pumpTask
+    if _pumpTask is not None:
+        _pumpTask.cancel()
+        _pumpTask = None
+
+def _resolveWaiters(waiters, value):
+    # Give value to every future waiting in the list and empty it
+    while waiters:
+        future = waiters.pop(0)
+        if not future.done():
+            future.set_result(value)
+
+# Timers of after() in headless mode, a heap of [time, number, func, args]
+_timers = []
+_timerCount = 0
+_quitting = False
+
+def after(ms, func, *args):
+    """Call func(*args) from the event loop (see mainloop) after ms
+    milliseconds. Returns an id for cancelAfter."""
+    global _timerCount
+    if not _headless:
+        return _getRoot().after(int(ms), func, *args)
+    _timerCount += 1
+    timer = [time.time() + ms/1000.0, _timerCount, func, args]
+    heapq.heappush(_timers, timer)
+    return timer
+
+def cancelAfter(timerId):
+    """Cancel a call scheduled with after"""
+    if not _headless:
+        _getRoot().after_cancel(timerId)
+    else:
+        timerId[2] = None
+
+def mainloop():
+    """Handle events and calls scheduled with after until quitMainloop
+    is called. In headless mode the loop also ends when nothing is
+    scheduled any more."""
+    global _quitting
+    _quitting = False
+    if not _headless:
+        _getRoot().mainloop()
+        return
+    while _timers and not _quitting:
+        due, number, func, args = _timers[0]
+        pause = due - time.time()
+        if pause > 0:
+            time.sleep(pause)
+        heapq.heappop(_timers)
+        if func is not None:
+            func(*args)
+
+def quitMainloop():
+    """Make mainloop return"""
+    global _quitting
+    _quitting = True
+    if _root is not None:
+        _root.quit()
 
 ############################################################################
 # Graphics classes start here
@@ -207,18 +344,18 @@ class GraphWin(tk.Canvas):
 
     """A GraphWin is a toplevel window for displaying graphics."""
 
+    def __new__(cls, *args, **kwargs):
+        # In headless mode windows are HeadlessGraphWins instead
+        if _headless and not issubclass(cls, HeadlessGraphWin):
+            cls = HeadlessGraphWin
+        return object.__new__(cls)
+
     def __init__(self, title="Graphics Window",
                  width=200, height=200, autoflush=True):
         assert type(title) == type(""), "Title must be a string"
-        master = tk.Toplevel(_root)
-        master.protocol("WM_DELETE_WINDOW", self.close)
-        tk.Canvas.__init__(self, master, width=width, height=height,
-                           highlightthickness=0, bd=0)
-        self.master.title(title)
-        self.pack()
-        master.resizable(0,0)
+        self._createCanvas(title, width, height)
         self.foreground = "black"
-        self.items = []
+        self.items = _ItemList()
         self.mouseX = None
         self.mouseY = None
         self.bind("<Button-1>", self._onClick)
@@ -227,11 +364,28 @@ class GraphWin(tk.Canvas):
         self.width = int(width)
         self.autoflush = autoflush
         self._mouseCallback = None
+        self._keyCallback = None
+        # Futures of asyncGetMouse and asyncGetKey calls
+        self._mouseWaiters = []
+        self._keyWaiters = []
         self.trans = None
         self.closed = False
-        master.lift()
+        self.master.lift()
         self.lastKey = ""
-        if autoflush: _root.update()
+        if autoflush: _updateRoot()
+
+    def _createCanvas(self, title, width, height):
+        master = tk.Toplevel(_getRoot())
+        master.protocol("WM_DELETE_WINDOW", self.close)
+        tk.Canvas.__init__(self, master, width=width, height=height,
+                           highlightthickness=0, bd=0)
+        self.master.title(title)
+        self.pack()
+        master.resizable(0,0)
+
+    def isHeadless(self):
+        """Returns True if this window is only kept in memory"""
+        return False
 
     def __repr__(self):
         if self.isClosed():
@@ -250,6 +404,9 @@ class GraphWin(tk.Canvas):
 
     def _onKey(self, evnt):
         self.lastKey = evnt.keysym
+        if self._keyWaiters:
+            self.lastKey = ""
+            _resolveWaiters(self._keyWaiters, evnt.keysym)
 
 
     def setBackground(self, color):
@@ -262,7 +419,7 @@ class GraphWin(tk.Canvas):
         """Set coordinates of window to run from (x1,y1) in the
         lower-left corner to (x2,y2) in the upper-right corner."""
         self.trans = Transform(self.width, self.height, x1, y1, x2, y2)
-        self.redraw()
+        self.remap()
 
     def close(self):
         """Close the window"""
@@ -270,6 +427,11 @@ class GraphWin(tk.Canvas):
         if self.closed: return
         self.closed = True
         self.master.destroy()
+        for future in self._mouseWaiters + self._keyWaiters:
+            if not future.done():
+                future.set_exception(GraphicsError("window closed while waiting for input"))
+        self._mouseWaiters = []
+        self._keyWaiters = []
         self.__autoflush()
 
 
@@ -283,7 +445,7 @@ class GraphWin(tk.Canvas):
 
     def __autoflush(self):
         if self.autoflush:
-            _root.update()
+            _updateRoot()
 
     
     def plot(self, x, y, color="black"):
@@ -334,6 +496,18 @@ class GraphWin(tk.Canvas):
         else:
             return None
 
+    async def asyncGetMouse(self):
+        """Like getMouse, but waits without blocking the asyncio event
+        loop: await win.asyncGetMouse()"""
+        if self.isClosed(): raise GraphicsError("getMouse in closed window")
+        self.update()      # flush any prior clicks
+        self.mouseX = None
+        self.mouseY = None
+        startAsyncPump()
+        future = asyncio.get_running_loop().create_future()
+        self._mouseWaiters.append(future)
+        return await future
+
     def getKey(self):
         """Wait for user to press a key and return it as a string."""
         self.lastKey = ""
@@ -346,6 +520,16 @@ class GraphWin(tk.Canvas):
         self.lastKey = ""
         return key
 
+    async def asyncGetKey(self):
+        """Like getKey, but waits without blocking the asyncio event
+        loop: await win.asyncGetKey()"""
+        if self.isClosed(): raise GraphicsError("getKey in closed window")
+        self.lastKey = ""
+        startAsyncPump()
+        future = asyncio.get_running_loop().create_future()
+        self._keyWaiters.append(future)
+        return await future
+
     def checkKey(self):
         """Return last key pressed or None if no key pressed since last call"""
         if self.isClosed():
@@ -379,25 +563,294 @@ class GraphWin(tk.Canvas):
         
     def setMouseHandler(self, func):
         self._mouseCallback = func
+
+    def setKeyHandler(self, func):
+        """Call func(key) for every key pressed while this window (or a
+        widget in it, like an Entry) has focus. key is the Tk keysym,
+        e.g. "Return". Use None to remove the handler."""
+        self._keyCallback = func
+        self.master.bind("<Key>", self._onWindowKey)
+
+    def _onWindowKey(self, e):
+        if self._keyCallback:
+            self._keyCallback(e.keysym)
         
     def _onClick(self, e):
         self.mouseX = e.x
         self.mouseY = e.y
         if self._mouseCallback:
             self._mouseCallback(Point(e.x, e.y))
+        if self._mouseWaiters:
+            x,y = self.toWorld(e.x, e.y)
+            self.mouseX = None
+            self.mouseY = None
+            _resolveWaiters(self._mouseWaiters, Point(x,y))
 
     def addItem(self, item):
-        self.items.append(item)
+        self.items.add(item)
 
     def delItem(self, item):
         self.items.remove(item)
 
     def redraw(self):
-        for item in self.items[:]:
+        for item in list(self.items):
             item.undraw()
             item.draw(self)
         self.update()
+
+    def remap(self):
+        """Move every drawn item to its place under the current
+        coordinates. Unlike redraw the canvas items are kept and only
+        their coordinates change, with a single update at the end."""
+        for item in self.items:
+            self.coords(item.id, item._coords(self))
+        self.update()
         
+
+
+class _ItemList:
+
+    """The items drawn in a GraphWin, in the order they were drawn.
+    Adding and removing an item take constant time."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self):
+        # A dict keeps insertion order, the values are unused
+        self._items = {}
+
+    def add(self, item):
+        self._items[item] = None
+
+    def remove(self, item):
+        del self._items[item]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __repr__(self):
+        return repr(list(self._items))
+
+
+class _HeadlessMaster:
+
+    """In-memory stand-in for the Tk toplevel of a headless window"""
+
+    def __init__(self, title):
+        self._title = title
+
+    def title(self, title=None):
+        if title is None:
+            return self._title
+        self._title = title
+
+    def protocol(self, name, func): pass
+    def resizable(self, width, height): pass
+    def lift(self): pass
+    def bind(self, sequence, func): pass
+    def destroy(self): pass
+
+
+class _CanvasModel:
+
+    """In-memory stand-in for the Tk canvas methods used by GraphWin and
+    the graphics objects. Every item is kept as [type, coords, options]."""
+
+    def _initCanvasModel(self, title, width, height):
+        self.master = _HeadlessMaster(title)
+        self.canvasItems = {}
+        self._nextItemId = 1
+        self._canvasOptions = {"width": width, "height": height, "bg": ""}
+
+    def _createItem(self, kind, coords, options, kw):
+        coords = list(coords)
+        if len(coords) == 1 and isinstance(coords[0], (list, tuple)):
+            coords = list(coords[0])
+        config = dict(options or {})
+        config.update(kw)
+        itemId = self._nextItemId
+        self._nextItemId += 1
+        self.canvasItems[itemId] = [kind, [float(c) for c in coords], config]
+        return itemId
+
+    def create_line(self, *coords, **kw):
+        options = coords[-1] if coords and isinstance(coords[-1], dict) else None
+        return self._createItem("line", coords[:-1] if options is not None else coords, options, kw)
+
+    def create_rectangle(self, *coords, **kw):
+        options = coords[-1] if coords and isinstance(coords[-1], dict) else None
+        return self._createItem("rectangle", coords[:-1] if options is not None else coords, options, kw)
+
+    def create_oval(self, *coords, **kw):
+        options = coords[-1] if coords and isinstance(coords[-1], dict) else None
+        return self._createItem("oval", coords[:-1] if options is not None else coords, options, kw)
+
+    def create_polygon(self, *coords, **kw):
+        options = coords[-1] if coords and isinstance(coords[-1], dict) else None
+        return self._createItem("polygon", coords[:-1] if options is not None else coords, options, kw)
+
+    def create_text(self, *coords, **kw):
+        options = coords[-1] if coords and isinstance(coords[-1], dict) else None
+        return self._createItem("text", coords[:-1] if options is not None else coords, options, kw)
+
+    def create_window(self, *coords, **kw):
+        return self._createItem("window", coords, None, kw)
+
+    def create_image(self, *coords, **kw):
+        return self._createItem("image", coords, None, kw)
+
+    def delete(self, itemId):
+        self.canvasItems.pop(itemId, None)
+
+    def move(self, itemId, dx, dy):
+        coords = self.canvasItems[itemId][1]
+        for i in range(0, len(coords), 2):
+            coords[i] += dx
+            coords[i+1] += dy
+
+    def coords(self, itemId, *coords):
+        item = self.canvasItems[itemId]
+        if not coords:
+            return list(item[1])
+        if len(coords) == 1 and isinstance(coords[0], (list, tuple)):
+            coords = coords[0]
+        item[1] = [float(c) for c in coords]
+
+    def itemconfig(self, itemId, options=None, **kw):
+        config = self.canvasItems[itemId][2]
+        config.update(options or {})
+        config.update(kw)
+
+    itemconfigure = itemconfig
+
+    def itemcget(self, itemId, option):
+        return self.canvasItems[itemId][2].get(option, "")
+
+    def type(self, itemId):
+        item = self.canvasItems.get(itemId)
+        return item[0] if item else None
+
+    def find_all(self):
+        return tuple(self.canvasItems)
+
+    def config(self, options=None, **kw):
+        self._canvasOptions.update(options or {})
+        self._canvasOptions.update(kw)
+
+    configure = config
+
+    def cget(self, option):
+        return self._canvasOptions.get(option, "")
+
+    def bind(self, sequence, func, add=None): pass
+    def bind_all(self, sequence, func, add=None): pass
+    def pack(self, **kw): pass
+    def update(self): pass
+    def update_idletasks(self): pass
+
+
+class HeadlessGraphWin(_CanvasModel, GraphWin):
+
+    """A GraphWin that draws into an in-memory canvas model instead of a
+    Tk canvas, so it needs no display. GraphWin creates these when
+    headless mode is on. Mouse clicks and key presses can be fed in with
+    click and press."""
+
+    def __init__(self, title="Graphics Window",
+                 width=200, height=200, autoflush=True):
+        self._clicks = []
+        self._keys = []
+        GraphWin.__init__(self, title, width, height, autoflush)
+
+    def _createCanvas(self, title, width, height):
+        self._initCanvasModel(title, width, height)
+
+    def isHeadless(self):
+        return True
+
+    def click(self, x, y):
+        """Queue a mouse click at raw (screen) position x, y. With a
+        mouse handler set or asyncGetMouse waiting the click is handled
+        right away instead."""
+        if self._mouseCallback or self._mouseWaiters:
+            self._onClick(_ClickEvent(x, y))
+        else:
+            self._clicks.append((x, y))
+
+    def press(self, key):
+        """Queue a key press, key is a Tk keysym such as a or Return.
+        With a key handler set or asyncGetKey waiting the key is handled
+        right away instead."""
+        if self._keyCallback or self._keyWaiters:
+            if self._keyCallback:
+                self._keyCallback(key)
+            _resolveWaiters(self._keyWaiters, key)
+        else:
+            self._keys.append(key)
+
+    def after(self, ms, func, *args):
+        return after(ms, func, *args)
+
+    def after_cancel(self, timerId):
+        cancelAfter(timerId)
+
+    def update(self):
+        # Deliver queued input, like Tk does for pending events
+        while self._clicks:
+            x, y = self._clicks.pop(0)
+            self._onClick(_ClickEvent(x, y))
+        while self._keys:
+            self.lastKey = self._keys.pop(0)
+
+    def getMouse(self):
+        """Return the next queued mouse click as a Point. There is nobody
+        to wait for in a headless window, so raises GraphicsError if no
+        click has been queued."""
+        if self.isClosed(): raise GraphicsError("getMouse in closed window")
+        if not self._clicks: raise GraphicsError("getMouse in headless window without queued clicks")
+        self.mouseX = self.mouseY = None
+        self.update()
+        x,y = self.toWorld(self.mouseX, self.mouseY)
+        self.mouseX = None
+        self.mouseY = None
+        return Point(x,y)
+
+    async def asyncGetMouse(self):
+        """Return the next queued mouse click, or wait for one to be fed
+        in with click (e.g. by another coroutine)"""
+        if self._clicks:
+            return self.getMouse()
+        return await GraphWin.asyncGetMouse(self)
+
+    async def asyncGetKey(self):
+        """Return the next queued key press, or wait for one to be fed
+        in with press"""
+        if self._keys:
+            return self.getKey()
+        return await GraphWin.asyncGetKey(self)
+
+    def getKey(self):
+        """Return the next queued key press. Raises GraphicsError if no
+        key press has been queued."""
+        if self.isClosed(): raise GraphicsError("getKey in closed window")
+        if not self._keys: raise GraphicsError("getKey in headless window without queued keys")
+        key = self._keys.pop(0)
+        self.lastKey = ""
+        return key
+
+
+class _ClickEvent:
+    # The parts of a Tk event that GraphWin._onClick uses
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
                       
 class Transform:
 
@@ -442,6 +895,10 @@ class GraphicsObject:
     """Generic base class for all of the drawable objects"""
     # A subclass of GraphicsObject should override _draw and
     #   and _move methods.
+
+    # Subclasses without __slots__ still get a __dict__, slots just keep
+    # Points (which are created in large numbers) small.
+    __slots__ = ("canvas", "id", "config")
     
     def __init__(self, options):
         # options is a list of strings indicating which options are
@@ -484,7 +941,7 @@ class GraphicsObject:
         self.id = self._draw(graphwin, self.config)
         graphwin.addItem(self)
         if graphwin.autoflush:
-            _root.update()
+            _updateRoot()
         return self
 
             
@@ -498,7 +955,7 @@ class GraphicsObject:
             self.canvas.delete(self.id)
             self.canvas.delItem(self)
             if self.canvas.autoflush:
-                _root.update()
+                _updateRoot()
         self.canvas = None
         self.id = None
 
@@ -520,7 +977,7 @@ class GraphicsObject:
                 y = dy
             self.canvas.move(self.id, x, y)
             if canvas.autoflush:
-                _root.update()
+                _updateRoot()
            
     def _reconfig(self, option, setting):
         # Internal method for changing configuration of the object
@@ -533,7 +990,7 @@ class GraphicsObject:
         if self.canvas and not self.canvas.isClosed():
             self.canvas.itemconfig(self.id, options)
             if self.canvas.autoflush:
-                _root.update()
+                _updateRoot()
 
 
     def _draw(self, canvas, options):
@@ -546,20 +1003,46 @@ class GraphicsObject:
         """updates internal state of object to move it dx,dy units"""
         pass # must override in subclass
 
+    def _coords(self, canvas):
+        """Returns the list of screen coordinates of the drawn figure
+        on canvas, as used by the Tk canvas coords method"""
+        pass # must override in subclass
+
          
 class Point(GraphicsObject):
+
+    __slots__ = ("x", "y")
+
+    # Points share this configuration until one of them is changed, most
+    # Points are never drawn so they don't need a dictionary of their own.
+    _defaultConfig = {"outline": DEFAULT_CONFIG["outline"], "fill": DEFAULT_CONFIG["fill"]}
+
     def __init__(self, x, y):
-        GraphicsObject.__init__(self, ["outline", "fill"])
-        self.setFill = self.setOutline
+        self.canvas = None
+        self.id = None
+        self.config = Point._defaultConfig
         self.x = float(x)
         self.y = float(y)
 
+    def setFill(self, color):
+        """A point only has one color, same as setOutline"""
+        self.setOutline(color)
+
+    def _reconfig(self, option, setting):
+        if self.config is Point._defaultConfig:
+            self.config = self.config.copy()
+        GraphicsObject._reconfig(self, option, setting)
+
     def __repr__(self):
         return "Point({}, {})".format(self.x, self.y)
         
     def _draw(self, canvas, options):
         x,y = canvas.toScreen(self.x,self.y)
         return canvas.create_rectangle(x,y,x+1,y+1,options)
+
+    def _coords(self, canvas):
+        x,y = canvas.toScreen(self.x,self.y)
+        return [x,y,x+1,y+1]
         
     def _move(self, dx, dy):
         self.x = self.x + dx
@@ -567,7 +1050,8 @@ class Point(GraphicsObject):
         
     def clone(self):
         other = Point(self.x,self.y)
-        other.config = self.config.copy()
+        if self.config is not Point._defaultConfig:
+            other.config = self.config.copy()
         return other
                 
     def getX(self): return self.x
@@ -588,6 +1072,11 @@ class _BBox(GraphicsObject):
         self.p2.x = self.p2.x + dx
         self.p2.y = self.p2.y  + dy
                 
+    def _coords(self, canvas):
+        x1,y1 = canvas.toScreen(self.p1.x,self.p1.y)
+        x2,y2 = canvas.toScreen(self.p2.x,self.p2.y)
+        return [x1,y1,x2,y2]
+
     def getP1(self): return self.p1.clone()
 
     def getP2(self): return self.p2.clone()
@@ -708,18 +1197,36 @@ class Polygon(GraphicsObject):
     def getPoints(self):
         return list(map(Point.clone, self.points))
 
+    def setPoints(self, *points):
+        """Replace the points of the polygon. A drawn polygon keeps its
+        canvas item, only its coordinates are changed."""
+        if len(points) == 1 and type(points[0]) == type([]):
+            points = points[0]
+        self.points = list(map(Point.clone, points))
+        canvas = self.canvas
+        if canvas and not canvas.isClosed():
+            canvas.coords(self.id, self._coords(canvas))
+            if canvas.autoflush:
+                _updateRoot()
+
     def _move(self, dx, dy):
         for p in self.points:
             p.move(dx,dy)
    
     def _draw(self, canvas, options):
-        args = [canvas]
+        args = []
         for p in self.points:
             x,y = canvas.toScreen(p.x,p.y)
             args.append(x)
             args.append(y)
         args.append(options)
-        return GraphWin.create_polygon(*args) 
+        return canvas.create_polygon(*args)
+
+    def _coords(self, canvas):
+        coords = []
+        for p in self.points:
+            coords.extend(canvas.toScreen(p.x,p.y))
+        return coords
 
 class Text(GraphicsObject):
     
@@ -740,6 +1247,9 @@ class Text(GraphicsObject):
         
     def _move(self, dx, dy):
         self.anchor.move(dx,dy)
+
+    def _coords(self, canvas):
+        return list(canvas.toScreen(self.anchor.x,self.anchor.y))
         
     def clone(self):
         other = Text(self.anchor, self.config['text'])
@@ -780,6 +1290,26 @@ class Text(GraphicsObject):
         self.setFill(color)
 
 
+class _StringVar:
+
+    """In-memory stand-in for tk.StringVar in headless mode"""
+
+    def __init__(self):
+        self.value = ""
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = str(value)
+
+
+def _stringVar():
+    if _headless:
+        return _StringVar()
+    return tk.StringVar(_getRoot())
+
+
 class Entry(GraphicsObject):
 
     def __init__(self, p, width):
@@ -787,7 +1317,7 @@ class Entry(GraphicsObject):
         self.anchor = p.clone()
         #print self.anchor
         self.width = width
-        self.text = tk.StringVar(_root)
+        self.text = _stringVar()
         self.text.set("")
         self.fill = "gray"
         self.color = "black"
@@ -800,6 +1330,8 @@ class Entry(GraphicsObject):
     def _draw(self, canvas, options):
         p = self.anchor
         x,y = canvas.toScreen(p.x,p.y)
+        if canvas.isHeadless():
+            return canvas.create_window(x,y)
         frm = tk.Frame(canvas.master)
         self.entry = tk.Entry(frm,
                               width=self.width,
@@ -818,13 +1350,16 @@ class Entry(GraphicsObject):
     def _move(self, dx, dy):
         self.anchor.move(dx,dy)
 
+    def _coords(self, canvas):
+        return list(canvas.toScreen(self.anchor.x,self.anchor.y))
+
     def getAnchor(self):
         return self.anchor.clone()
 
     def clone(self):
         other = Entry(self.anchor, self.width)
         other.config = self.config.copy()
-        other.text = tk.StringVar()
+        other.text = _stringVar()
         other.text.set(self.text.get())
         other.fill = self.fill
         return other
@@ -881,11 +1416,13 @@ class Image(GraphicsObject):
         self.anchor = p.clone()
         self.imageId = Image.idCount
         Image.idCount = Image.idCount + 1
-        if len(pixmap) == 1: # file name provided
-            self.img = tk.PhotoImage(file=pixmap[0], master=_root)
+        if _headless:
+            self.img = _HeadlessPhoto(*pixmap)
+        elif len(pixmap) == 1: # file name provided
+            self.img = tk.PhotoImage(file=pixmap[0], master=_getRoot())
         else: # width and height provided
             width, height = pixmap
-            self.img = tk.PhotoImage(master=_root, width=width, height=height)
+            self.img = tk.PhotoImage(master=_getRoot(), width=width, height=height)
 
     def __repr__(self):
         return "Image({}, {}, {})".format(self.anchor, self.getWidth(), self.getHeight())
@@ -898,6 +1435,9 @@ class Image(GraphicsObject):
     
     def _move(self, dx, dy):
         self.anchor.move(dx,dy)
+
+    def _coords(self, canvas):
+        return list(canvas.toScreen(self.anchor.x,self.anchor.y))
         
     def undraw(self):
         try:
@@ -945,6 +1485,67 @@ class Image(GraphicsObject):
         self.img.put("{" + color +"}", (x, y))
         
 
+    def getPixels(self):
+        """Returns the RGB values of all pixels as bytes, row by row
+        with 3 bytes per pixel. For a NumPy array use
+        numpy.frombuffer(image.getPixels(), numpy.uint8).reshape(height, width, 3)
+
+        """
+
+        if isinstance(self.img, _HeadlessPhoto):
+            return bytes(self.img.pixels)
+        # One Tk call for the whole image: a list of rows of "#rrggbb"
+        # colors, which tkinter may return as a string or as tuples
+        rows = self.img.tk.splitlist(self.img.tk.call(self.img.name, "data"))
+        data = " ".join(row if isinstance(row, str) else " ".join(row) for row in rows)
+        return bytes.fromhex(data.replace("#", ""))
+
+    def setPixels(self, pixels, x=0, y=0, width=None):
+        """Sets a block of pixels from RGB values (3 bytes per pixel, row
+        by row) in pixels, e.g. bytes or a NumPy uint8 array. The block is
+        width pixels wide (by default the width of the image) and its top
+        left pixel is (x,y)
+
+        """
+
+        pixels = memoryview(pixels).cast("B")
+        if width is None:
+            width = self.getWidth()
+        rowSize = width*3
+        if width <= 0 or len(pixels) % rowSize:
+            raise GraphicsError("pixel data doesn't fill whole rows of the given width")
+        height = len(pixels) // rowSize
+        if x < 0 or y < 0 or x + width > self.getWidth() or y + height > self.getHeight():
+            raise GraphicsError("pixel block is outside the image")
+        if isinstance(self.img, _HeadlessPhoto):
+            imageRowSize = self.img.width()*3
+            for row in range(height):
+                start = (y + row)*imageRowSize + x*3
+                self.img.pixels[start:start + rowSize] = pixels[row*rowSize:(row + 1)*rowSize]
+            return
+        # A single put with every row as a list of "#rrggbb" colors
+        rows = ["{#" + pixels[row*rowSize:(row + 1)*rowSize].hex(" ", 3).replace(" ", " #") + "}"
+                for row in range(height)]
+        self.img.put(" ".join(rows), to=(x, y))
+
+    def fill(self, color, x=0, y=0, width=None, height=None):
+        """Sets all pixels of the rectangle that is width by height pixels
+        with top left pixel (x,y) to color, by default the whole image
+
+        """
+
+        if width is None:
+            width = self.getWidth() - x
+        if height is None:
+            height = self.getHeight() - y
+        if width <= 0 or height <= 0:
+            return
+        if isinstance(self.img, _HeadlessPhoto):
+            row = bytes(_parseColor(color))*width
+            self.setPixels(row*height, x, y, width)
+        else:
+            self.img.put(color, to=(x, y, x + width, y + height))
+
     def save(self, filename):
         """Saves the pixmap image to filename.
         The format for the save image is determined from the filname extension.
@@ -955,6 +1556,93 @@ class Image(GraphicsObject):
         ext = name.split(".")[-1]
         self.img.write( filename, format=ext)
 
+
+
+class _HeadlessPhoto:
+
+    """In-memory stand-in for tk.PhotoImage in headless mode. Pixels are
+    kept as RGB bytes, only PPM files can be read and written."""
+
+    def __init__(self, *pixmap):
+        if len(pixmap) == 1: # file name provided
+            with open(pixmap[0], "rb") as f:
+                self._width, self._height, self.pixels = _readPPM(f.read())
+        else:
+            self._width, self._height = int(pixmap[0]), int(pixmap[1])
+            self.pixels = bytearray(self._width*self._height*3)
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def get(self, x, y):
+        i = (y*self._width + x)*3
+        return tuple(self.pixels[i:i+3])
+
+    def put(self, data, to=None):
+        x, y = to
+        self.pixels[(y*self._width + x)*3:(y*self._width + x)*3 + 3] = bytes(_parseColor(data.strip("{}")))
+
+    def copy(self):
+        other = _HeadlessPhoto(self._width, self._height)
+        other.pixels[:] = self.pixels
+        return other
+
+    def write(self, filename, format=None):
+        if format is not None and format.lower() not in ("ppm", "pnm"):
+            raise GraphicsError("headless images can only be saved as PPM")
+        with open(filename, "wb") as f:
+            f.write(b"P6\n%d %d\n255\n" % (self._width, self._height))
+            f.write(self.pixels)
+
+
+def _readPPM(data):
+    # Parses a binary (P6) PPM file, returns width, height and the RGB bytes
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos+1].isspace():
+            pos += 1
+        if data[pos:pos+1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        end = pos
+        while not data[end:end+1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    if fields[0] != b"P6" or int(fields[3]) != 255:
+        raise GraphicsError("headless images can only be read from 8-bit binary PPM files")
+    width, height = int(fields[1]), int(fields[2])
+    pos += 1
+    return width, height, bytearray(data[pos:pos + width*height*3])
+
+
+# RGB values of the color names commonly used with this module. Tk knows
+# many more, these are the ones available without Tk (headless mode).
+_COLOR_NAMES = {
+    "black": (0, 0, 0), "white": (255, 255, 255),
+    "red": (255, 0, 0), "green": (0, 255, 0), "blue": (0, 0, 255),
+    "yellow": (255, 255, 0), "cyan": (0, 255, 255), "magenta": (255, 0, 255),
+    "orange": (255, 165, 0), "purple": (160, 32, 240), "brown": (165, 42, 42),
+    "pink": (255, 192, 203), "gray": (190, 190, 190), "grey": (190, 190, 190),
+    "lightgray": (211, 211, 211), "lightgrey": (211, 211, 211),
+    "darkgray": (169, 169, 169), "darkgrey": (169, 169, 169),
+    "darkgreen": (0, 100, 0), "darkolivegreen": (85, 107, 47), "darkblue": (0, 0, 139), "darkred": (139, 0, 0),
+}
+
+def _parseColor(color):
+    # Returns (r, g, b) for a color name or a "#rrggbb" specifier
+    color = color.strip()
+    if color.startswith("#") and len(color) == 7:
+        return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+    try:
+        return _COLOR_NAMES[color.lower().replace(" ", "")]
+    except KeyError:
+        raise GraphicsError(BAD_OPTION)
+
         
 def color_rgb(r,g,b):
     """r,g,b are intensities of red, green, and blue in range(256)
@@ -1008,8 +1696,7 @@ def test():
 #MacOS fix 2
 #tk.Toplevel(_root).destroy()
 
-# MacOS fix 1
-update()
+# MacOS fix 1 is applied when the root is created, see _getRoot
 
 if __name__ == "__main__":
     test()
@@ -2,34 +2,93 @@
 from random import choice
 from gamemodel import *
 from gamegraphics import *
+from gameai import computerAim
 
 
 # Here is a nice little method you get for free
-# It fires a shot for the current player and animates it until it stops
-def graphicFire(game, graphics, angle, vel):
+# It fires a shot for the current player and animates it until it stops.
+# The physics takes physicsRate steps per second and at most frameRate
+# frames per second are drawn, see FlightLoop
+def graphicFire(game, graphics, angle, vel, physicsRate=50, frameRate=50):
     player = game.getCurrentPlayer()
     # create a shot and track until it hits ground or leaves window
     proj = player.fire(angle, vel)
-    while proj.isMoving():
-        proj.update(1/50)
-        graphics.sync() # This deals with all graphics-related issues
-        update(50) # Waits for a short amount of time before the next iteration
-    return proj
+    return FlightLoop(graphics, proj, physicsRate, frameRate).run()
 
-def graphicPlay():
+# computerPlayers are the numbers of the players that are controlled by the computer,
+# they aim within aimBudget seconds instead of waiting for the input dialog
+def graphicPlay(computerPlayers=(), aimBudget=0.005):
     game = Game(10,3)
     graphics = GameGraphics(game)
 
     while True:
-        choice = graphics.dialog.interact()
-        if choice == "Fire!":
+        if game.getCurrentPlayerNumber() in computerPlayers:
+            angle, vel = computerAim(game, timeBudget=aimBudget)
+        else:
+            choice = graphics.dialog.interact()
+            if choice == "Quit":
+                break
             #get angle and velocity from input
             angle, vel = graphicInput(graphics)
-            proj = graphicFire(game, graphics, angle, vel)
-            finishShot(game, graphics, proj)
-        
-        if choice == "Quit":
-            break
+        proj = graphicFire(game, graphics, angle, vel)
+        finishShot(game, graphics, proj)
+
+# Same game as graphicPlay, but driven by the event loop: input comes from
+# callbacks on the dialog and flights are animated with after(), so the
+# program uses no CPU while waiting for the player
+def graphicPlayEvents(computerPlayers=(), aimBudget=0.005):
+    game = Game(10,3)
+    graphics = GameGraphics(game)
+    dialog = graphics.dialog
+
+    def nextTurn():
+        if game.getCurrentPlayerNumber() in computerPlayers:
+            fire(*computerAim(game, timeBudget=aimBudget))
+        else:
+            dialog.listen(onFire, onQuit)
+
+    def onFire():
+        # Values that aren't numbers are ignored, the dialog keeps listening for a corrected shot
+        try:
+            angle, vel = graphicInput(graphics)
+        except ValueError:
+            return
+        # Ignore input while the ball is flying
+        dialog.stopListening()
+        fire(angle, vel)
+
+    def onQuit():
+        dialog.stopListening()
+        quitMainloop()
+
+    def fire(angle, vel):
+        proj = game.getCurrentPlayer().fire(angle, vel)
+        FlightLoop(graphics, proj).start(landed)
+
+    def landed(proj):
+        finishShot(game, graphics, proj)
+        nextTurn()
+
+    nextTurn()
+    mainloop()
+
+# Same game as graphicPlay as a coroutine, so it can share an asyncio event
+# loop with other tasks (e.g. a server): asyncio.run(graphicPlayAsync())
+async def graphicPlayAsync(computerPlayers=(), aimBudget=0.005):
+    game = Game(10,3)
+    graphics = GameGraphics(game)
+
+    while True:
+        if game.getCurrentPlayerNumber() in computerPlayers:
+            angle, vel = computerAim(game, timeBudget=aimBudget)
+        else:
+            choice = await graphics.dialog.asyncInteract()
+            if choice == "Quit":
+                break
+            angle, vel = graphicInput(graphics)
+        proj = game.getCurrentPlayer().fire(angle, vel)
+        await FlightLoop(graphics, proj).runAsync()
+        finishShot(game, graphics, proj)
 
 def graphicInput(graphics):
     newAngle, newVel = graphics.dialog.getValues()
@@ -38,12 +97,15 @@ def graphicInput(graphics):
 def finishShot(game, graphics, proj):
     # The current player
     player = game.getCurrentPlayer()
-    # The player opposing the current player
-    other = game.getOtherPlayer()
 
-    # Check if we won
-    distance = other.projectileDistance(proj) 
-    if distance == 0:
+    # Dig a crater where the ball landed
+    terrain = game.getTerrain()
+    if terrain is not None and proj.getY() <= terrain.heightAt(proj.getX()):
+        terrain.carve(proj.getX(), 2*game.getBallSize())
+        graphics.sync()
+
+    # Check if we hit any other player
+    if game.getPlayerHit(proj.getX(), player) is not None:
         player.increaseScore()
         
         # Start a new round
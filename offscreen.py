@@ -0,0 +1,383 @@
+import zlib
+import struct
+import numpy as np
+import graphics
+
+"""
+    Offscreen rendering of graphics.py windows into NumPy RGB buffers, and writers that stream
+    the frames to PPM or PNG files or to an animated GIF. No display or Tk is needed, so this
+    works with headless windows (see graphics.setHeadless) on servers.
+
+    The items drawn in a window (GraphWin.items) are rasterized in drawing order, with the
+    window's own coordinate transformation. Rectangles, ovals and circles, lines, polygons,
+    points and images are drawn as they look on screen. Text is drawn as a placeholder block
+    for every character, entry boxes as empty boxes.
+"""
+
+# Colors that can't be parsed (Tk knows more names than graphics) are drawn in this color
+UNKNOWN_COLOR = (128, 128, 128)
+
+# Size in pixels of the block drawn for each character of a Text
+CHARACTER_SIZE = (6, 9)
+
+
+# The (r, g, b) of a color option, None for no color
+def _color(color, cache={}):
+    if not color:
+        return None
+    rgb = cache.get(color)
+    if rgb is None:
+        try:
+            rgb = graphics._parseColor(color)
+        except graphics.GraphicsError:
+            rgb = UNKNOWN_COLOR
+        cache[color] = rgb
+    return rgb
+
+
+""" Renders a window into an RGB buffer """
+class Renderer:
+    """ win: the GraphWin to render, its width and height give the size of the frames """
+    def __init__(self, win):
+        self.win = win
+        self.width = win.getWidth()
+        self.height = win.getHeight()
+        self.frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        # Pixel coordinates of every column and row, for the shapes that need a mask
+        self._columns = np.arange(self.width)
+        self._rows = np.arange(self.height)
+        self._background = None
+        self._backgroundColor = None
+
+    """ Draws the current contents of the window and returns the frame, an array of shape (height, width, 3) that is reused by the next render """
+    def render(self):
+        frame = self.frame
+        color = _color(self.win.cget("bg")) or (255, 255, 255)
+        if color != self._backgroundColor:
+            self._background = np.empty_like(frame)
+            self._background[:] = color
+            self._backgroundColor = color
+        np.copyto(frame, self._background)
+        for item in self.win.items:
+            self._drawItem(item)
+        return frame
+
+    def _drawItem(self, item):
+        config = item.config
+        coords = item._coords(self.win)
+        width = int(float(config.get("width", 1)))
+        if isinstance(item, graphics.Oval):
+            self._ellipse(coords, _color(config.get("fill")), _color(config.get("outline")), width)
+        elif isinstance(item, graphics.Rectangle):
+            self._rectangle(coords, _color(config.get("fill")), _color(config.get("outline")), width)
+        elif isinstance(item, graphics.Line):
+            self._line(coords, _color(config.get("fill")), width)
+        elif isinstance(item, graphics.Polygon):
+            self._polygon(coords, _color(config.get("fill")), _color(config.get("outline")), width)
+        elif isinstance(item, graphics.Text):
+            self._text(coords, str(config.get("text", "")), _color(config.get("fill")))
+        elif isinstance(item, graphics.Entry):
+            characterWidth, characterHeight = CHARACTER_SIZE
+            x, y = coords
+            half = item.width*characterWidth//2 + 2, characterHeight//2 + 3
+            self._rectangle([x - half[0], y - half[1], x + half[0], y + half[1]], (255, 255, 255), (0, 0, 0), 1)
+        elif isinstance(item, graphics.Image):
+            self._image(coords, item)
+        elif isinstance(item, graphics.Point):
+            self._fill(coords[0], coords[1], coords[0] + 1, coords[1] + 1,
+                       _color(config.get("fill")) or _color(config.get("outline")))
+
+    # Fills the pixels x1 <= x < x2, y1 <= y < y2, clipped to the frame
+    def _fill(self, x1, y1, x2, y2, color):
+        if color is None:
+            return
+        x1, y1 = max(int(x1), 0), max(int(y1), 0)
+        x2, y2 = min(int(x2), self.width), min(int(y2), self.height)
+        if x1 < x2 and y1 < y2:
+            self.frame[y1:y2, x1:x2] = color
+
+    def _rectangle(self, coords, fill, outline, width):
+        x1, y1, x2, y2 = coords
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        self._fill(x1, y1, x2 + 1, y2 + 1, fill)
+        if outline is not None and width > 0:
+            self._fill(x1, y1, x2 + 1, y1 + width, outline)
+            self._fill(x1, y2 + 1 - width, x2 + 1, y2 + 1, outline)
+            self._fill(x1, y1, x1 + width, y2 + 1, outline)
+            self._fill(x2 + 1 - width, y1, x2 + 1, y2 + 1, outline)
+
+    def _ellipse(self, coords, fill, outline, width):
+        x1, y1, x2, y2 = coords
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        left, top = max(int(x1), 0), max(int(y1), 0)
+        right, bottom = min(int(x2) + 1, self.width), min(int(y2) + 1, self.height)
+        if left >= right or top >= bottom:
+            return
+        cx, cy = (x1 + x2)/2.0, (y1 + y2)/2.0
+        rx, ry = max((x2 - x1)/2.0, 0.5), max((y2 - y1)/2.0, 0.5)
+        dx = (self._columns[left:right] + 0.5 - cx)[np.newaxis, :]
+        dy = (self._rows[top:bottom] + 0.5 - cy)[:, np.newaxis]
+        inside = (dx/rx)**2 + (dy/ry)**2 <= 1
+        region = self.frame[top:bottom, left:right]
+        if fill is not None:
+            region[inside] = fill
+        if outline is not None and width > 0:
+            innerX, innerY = max(rx - width, 1e-9), max(ry - width, 1e-9)
+            region[inside & ((dx/innerX)**2 + (dy/innerY)**2 > 1)] = outline
+
+    def _line(self, coords, color, width):
+        if color is None or len(coords) < 4:
+            return
+        points = np.asarray(coords, dtype=float).reshape(-1, 2)
+        x1, y1 = points[:-1, 0], points[:-1, 1]
+        dx, dy = points[1:, 0] - x1, points[1:, 1] - y1
+        # Every segment is sampled once per pixel along its main direction, all segments at once
+        steps = np.maximum(np.abs(dx), np.abs(dy)).astype(np.intp) + 1
+        segment = np.repeat(np.arange(len(steps)), steps)
+        first = np.cumsum(steps) - steps
+        t = (np.arange(len(segment)) - first[segment]) / np.maximum(steps - 1, 1)[segment]
+        xs = np.rint(x1[segment] + t*dx[segment]).astype(np.intp)
+        ys = np.rint(y1[segment] + t*dy[segment]).astype(np.intp)
+        # Lines wider than a pixel are widened across their main direction
+        if width > 1:
+            offsets = np.arange(width) - (width - 1)//2
+            steep = (np.abs(dy) > np.abs(dx))[segment][:, np.newaxis]
+            xs, ys = (xs[:, np.newaxis] + offsets*steep).ravel(), (ys[:, np.newaxis] + offsets*~steep).ravel()
+        visible = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.frame[ys[visible], xs[visible]] = color
+
+    def _polygon(self, coords, fill, outline, width):
+        xs = np.asarray(coords[0::2], dtype=float)
+        ys = np.asarray(coords[1::2], dtype=float)
+        if fill is not None and len(xs) >= 3:
+            top, bottom = max(int(ys.min()), 0), min(int(ys.max()) + 1, self.height)
+            left, right = max(int(xs.min()), 0), min(int(xs.max()) + 1, self.width)
+            if top < bottom and left < right:
+                # Even-odd scanline fill: every edge crossing a row's pixel centre flips the
+                # inside state from there on, counted with a cumulative sum along the row
+                x1, y1, x2, y2 = xs, ys, np.roll(xs, -1), np.roll(ys, -1)
+                rows = np.arange(top, bottom) + 0.5
+                crosses = ((y1[:, np.newaxis] <= rows) != (y2[:, np.newaxis] <= rows))
+                edge, row = np.nonzero(crosses)
+                t = (rows[row] - y1[edge]) / (y2[edge] - y1[edge])
+                crossX = x1[edge] + t*(x2[edge] - x1[edge])
+                column = np.clip(np.ceil(crossX - 0.5).astype(np.intp) - left, 0, right - left)
+                flips = np.zeros((bottom - top, right - left + 1), dtype=np.int32)
+                np.add.at(flips, (row, column), 1)
+                inside = np.cumsum(flips, axis=1)[:, :-1] % 2 == 1
+                self.frame[top:bottom, left:right][inside] = fill
+        if outline is not None and width > 0 and len(xs) >= 2:
+            closed = list(coords) + list(coords[:2])
+            self._line(closed, outline, width)
+
+    def _text(self, coords, text, color):
+        if color is None or not text:
+            return
+        characterWidth, characterHeight = CHARACTER_SIZE
+        lines = text.split("\n")
+        x, y = coords
+        top = y - len(lines)*characterHeight/2.0
+        for number, line in enumerate(lines):
+            left = x - len(line)*characterWidth/2.0
+            lineTop = top + number*characterHeight
+            for i, character in enumerate(line):
+                if not character.isspace():
+                    self._fill(left + i*characterWidth + 1, lineTop + 1,
+                               left + (i + 1)*characterWidth - 1, lineTop + characterHeight - 1, color)
+
+    def _image(self, coords, item):
+        width, height = item.getWidth(), item.getHeight()
+        pixels = np.frombuffer(item.getPixels(), dtype=np.uint8).reshape(height, width, 3)
+        x = int(coords[0]) - width//2
+        y = int(coords[1]) - height//2
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, self.width), min(y + height, self.height)
+        if left < right and top < bottom:
+            self.frame[top:bottom, left:right] = pixels[top - y:bottom - y, left - x:right - x]
+
+
+""" Writes frame (an RGB array) to a binary file object as a binary PPM image """
+def writePPM(file, frame):
+    height, width = frame.shape[:2]
+    file.write("P6\n{} {}\n255\n".format(width, height).encode())
+    file.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+
+
+def _pngChunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+""" Writes frame (an RGB array) to a binary file object as a PNG image, level is the zlib compression level """
+def writePNG(file, frame, level=1):
+    height, width = frame.shape[:2]
+    # Every row starts with filter type 0 (none)
+    rows = np.zeros((height, width*3 + 1), dtype=np.uint8)
+    rows[:, 1:] = frame.reshape(height, width*3)
+    file.write(b"\x89PNG\r\n\x1a\n")
+    file.write(_pngChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+    file.write(_pngChunk(b"IDAT", zlib.compress(rows.tobytes(), level)))
+    file.write(_pngChunk(b"IEND", b""))
+
+
+""" Writes every frame to its own PPM or PNG file, named by pattern (e.g. "frame-{:05d}.png") and the frame number """
+class ImageSequenceWriter:
+    def __init__(self, pattern, format="png"):
+        if format not in ("png", "ppm"):
+            raise ValueError("format should be png or ppm")
+        self.pattern = pattern
+        self.format = format
+        self.frames = 0
+
+    def write(self, frame):
+        with open(self.pattern.format(self.frames), "wb") as file:
+            if self.format == "png":
+                writePNG(file, frame)
+            else:
+                writePPM(file, frame)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+"""
+    Writes frames to an animated GIF. Only the rectangle that changed since the previous frame is
+    stored, drawn over it. Rectangles with at most 256 colors keep their exact colors, others are
+    reduced to a fixed palette of 6x7x6 colors.
+    The image data is written with the LZW codes of single pixels only (a clear code resets the
+    code table before it grows), which a GIF decoder reads like any other GIF but which can be
+    encoded with array operations instead of a dictionary per pixel.
+"""
+class GIFWriter:
+    """ file: a binary file object, delay: the time each frame is shown in seconds """
+    def __init__(self, file, width, height, delay=1/25, loop=True):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.delay = max(int(round(delay*100)), 1)
+        self.frames = 0
+        self.previous = None
+        file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0))
+        if loop:
+            file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def write(self, frame):
+        left, top, right, bottom = 0, 0, self.width, self.height
+        if self.previous is None:
+            self.previous = frame.copy()
+        else:
+            # Compared as rows of bytes, reducing over whole rows is much faster than over the 3 channels
+            changed = (frame != self.previous).reshape(self.height, self.width*3)
+            rows = np.flatnonzero(changed.any(axis=1))
+            if len(rows):
+                top, bottom = rows[0], rows[-1] + 1
+                columns = np.flatnonzero(changed[top:bottom].any(axis=0)) // 3
+                left, right = columns[0], columns[-1] + 1
+            else:
+                # An unchanged frame still needs a pixel to show for its delay
+                bottom, right = 1, 1
+            np.copyto(self.previous, frame)
+        indices, palette = _palette(frame[top:bottom, left:right])
+        table = np.zeros((256, 3), dtype=np.uint8)
+        table[:len(palette)] = palette
+        # Graphic control extension: the frame is kept when the next one is drawn over it
+        self.file.write(b"\x21\xf9\x04\x04" + struct.pack("<H", self.delay) + b"\x00\x00")
+        # Image descriptor with a local color table of 256 colors
+        self.file.write(b"\x2c" + struct.pack("<HHHHB", left, top, right - left, bottom - top, 0x87))
+        self.file.write(table.tobytes())
+        self.file.write(b"\x08")
+        self.file.write(_subBlocks(_lzwLiterals(indices.ravel())))
+        self.frames += 1
+
+    def close(self):
+        self.file.write(b"\x3b")
+
+
+# Color indices and a palette (at most 256 colors) for an RGB frame
+def _palette(frame):
+    packed = (frame[..., 0].astype(np.uint32) << 16) | (frame[..., 1].astype(np.uint32) << 8) | frame[..., 2]
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) <= 256:
+        palette = np.stack([(colors >> 16) & 255, (colors >> 8) & 255, colors & 255], axis=1).astype(np.uint8)
+        return indices.astype(np.uint8).reshape(frame.shape[:2]), palette
+    # 6 levels of red and blue and 7 of green
+    r = (frame[..., 0].astype(np.uint16)*5 + 127) // 255
+    g = (frame[..., 1].astype(np.uint16)*6 + 127) // 255
+    b = (frame[..., 2].astype(np.uint16)*5 + 127) // 255
+    levels = np.array(np.meshgrid(np.arange(6), np.arange(7), np.arange(6), indexing="ij")).reshape(3, -1).T
+    palette = (levels*255 // np.array([5, 6, 5])).astype(np.uint8)
+    return (r*42 + g*6 + b).astype(np.uint8), palette
+
+
+# GIF image data for 8 bit color indices using only literal codes of 9 bits, with a clear code
+# before every 254 pixels so the decoder's code table never needs codes of 10 bits
+def _lzwLiterals(indices):
+    clear, end = 256, 257
+    count = len(indices)
+    groups = (count + 253) // 254
+    codes = np.full(groups*255 + 1, clear, dtype=np.uint16)
+    positions = np.arange(count) + np.arange(count)//254 + 1
+    codes[positions] = indices
+    codes = codes[:count + groups]
+    codes = np.append(codes, end)
+    bits = ((codes[:, np.newaxis] >> np.arange(9, dtype=np.uint16)) & 1).astype(np.uint8)
+    return np.packbits(bits.ravel(), bitorder="little").tobytes()
+
+
+# data split into GIF sub-blocks of at most 255 bytes, followed by the block terminator
+def _subBlocks(data):
+    blocks = []
+    for start in range(0, len(data), 255):
+        chunk = data[start:start + 255]
+        blocks.append(bytes([len(chunk)]) + chunk)
+    blocks.append(b"\x00")
+    return b"".join(blocks)
+
+
+"""
+    Renders the flight of proj in the game graphics ggame frame by frame into writer (any object
+    with write(frame)), in simulated time: frameRate frames per simulated second with physicsRate
+    physics steps per second, as fast as the machine can. Returns the number of frames written.
+"""
+def renderFlight(ggame, proj, writer, frameRate=25, physicsRate=50):
+    renderer = Renderer(ggame.getWindow())
+    dt = 1/physicsRate
+    frameTime = 1/frameRate
+    simulated = rendered = 0.0
+    frames = 0
+    while True:
+        while proj.isMoving() and simulated + dt <= rendered + 1e-12:
+            proj.update(dt)
+            simulated += dt
+        ggame.sync()
+        writer.write(renderer.render())
+        frames += 1
+        if not proj.isMoving():
+            return frames
+        rendered += frameTime
+
+
+if __name__ == "__main__":
+    # Renders a few flights to an animated GIF, and the last frame to a PNG
+    import sys
+    import time
+    import gamemodel
+    import gamegraphics
+    graphics.setHeadless(True)
+    game = gamemodel.Game(10, 3, seed=1)
+    ggame = gamegraphics.GameGraphics(game)
+    name = sys.argv[1] if len(sys.argv) > 1 else "flights"
+    start = time.perf_counter()
+    frames = 0
+    with open(name + ".gif", "wb") as file:
+        writer = GIFWriter(file, ggame.getWindow().getWidth(), ggame.getWindow().getHeight())
+        for angle, velocity in ((45, 40), (60, 35), (30, 50)):
+            frames += renderFlight(ggame, game.getCurrentPlayer().fire(angle, velocity), writer)
+            game.nextPlayer()
+        writer.close()
+    with open(name + ".png", "wb") as file:
+        writePNG(file, Renderer(ggame.getWindow()).render())
+    elapsed = time.perf_counter() - start
+    print("{} frames in {:.2f}s ({:.0f} frames/s), written to {}.gif".format(frames, elapsed, frames/elapsed, name))
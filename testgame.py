@@ -1,8 +1,16 @@
 # A simple testing procedure for the game model
 
+import io
+import random
+import tempfile
 import graphics
 import gamemodel
 import gamegraphics
+import gamebatch
+from gametable import LandingTable
+from gameterrain import Terrain
+from gamereplay import Replay
+from tournament import playGame, randomStrategy
 
 def runTests(game):
 
@@ -104,6 +112,24 @@ def runTests(game):
     game.newRound()
     assert game.getCurrentWind()!=1000, "Wind should be randomized each round"
 
+    # Test reproducible winds: the same seed or generator gives the same rounds
+    seeded = [gamemodel.Game(10, 3, seed=5), gamemodel.Game(10, 3, seed=5), gamemodel.Game(10, 3, rng=random.Random(5))]
+    for i in range(5):
+        winds = []
+        for g in seeded:
+            g.newRound()
+            winds.append(g.getCurrentWind())
+        assert winds[0] == winds[1] == winds[2], "games with the same seed should get the same winds"
+
+    # A snapshot restored after drawWinds gives exactly those winds again through newRound
+    state = seeded[0].getRandomState()
+    drawn = seeded[0].drawWinds(50)
+    assert all(-10 <= w <= 10 for w in drawn), "drawn winds should be in [-10,10]"
+    seeded[0].setRandomState(state)
+    for w in drawn:
+        seeded[0].newRound()
+        assert seeded[0].getCurrentWind() == w, "newRound should give the winds drawWinds drew"
+
     # Test firing with wind
     game.setCurrentWind(-1)
     proj = players[0].fire(45,41)
@@ -119,19 +145,171 @@ def runTests(game):
         
     assert ticks == 61, "Incorrect tick-count"
     assert abs(proj.getX() - 68.2424059747553) < 0.01, "Projectile X-Position is {0:f}, should be 68.2424059747553".format(proj.getX())
-    
-    
+
+    # Test closed-form landing, should agree with the ticks above
+    proj = players[0].fire(45,41)
+    time, x, hitWall = proj.landing(0.1)
+    assert abs(time - 6.1) < 1e-9, "Landing time is {0:f}, should be 6.1".format(time)
+    assert abs(x - 68.2424059747553) < 0.01, "Landing X-Position is {0:f}, should be 68.2424059747553".format(x)
+    assert not hitWall, "projectile should land on the ground"
+    proj.land(0.1)
+    assert not proj.isMoving(), "projectile should have stopped after land()"
+    assert proj.getY() == 0.0, "projectile should stop at y=0"
+
+    # Test event-detecting steps, one large step should stop exactly at the impact
+    proj = players[0].fire(45,41)
+    time, x, hitWall = proj.landing()
+    assert proj.advance(1.0) is None, "projectile should still be moving after 1 second"
+    impact = proj.advance(100.0)
+    assert impact is not None and not proj.isMoving(), "projectile should have stopped at the impact"
+    assert abs(impact[0] + 1.0 - time) < 1e-9, "Impact time is {0:f}, should be {1:f}".format(impact[0] + 1.0, time)
+    assert abs(proj.getX() - x) < 1e-9 and proj.getY() == 0.0, "projectile should stop exactly at the impact"
+
+    # Test batches of projectiles, they should give the same results as single projectiles
+    angles, velocities = [30, 45, 45, 70, 10], [31, 41, 80, 35, 20]
+    for player in players:
+        batch = gamebatch.fireBatch(player, angles, velocities)
+        xs = batch.run(0.1)
+        ticks = batch.getTicks()
+        time, x, hitWall = gamebatch.fireBatch(player, angles, velocities).landing()
+        for i in range(len(angles)):
+            proj = player.fire(angles[i], velocities[i])
+            expected = proj.landing()
+            steps = 0
+            while proj.isMoving():
+                proj.update(0.1)
+                steps += 1
+            assert ticks[i] == steps, "batch tick-count is {}, should be {}".format(ticks[i], steps)
+            assert abs(xs[i] - proj.getX()) < 1e-9, "batch X-Position is {0:f}, should be {1:f}".format(xs[i], proj.getX())
+            assert abs(time[i] - expected[0]) < 1e-9 and abs(x[i] - expected[1]) < 1e-9 and hitWall[i] == expected[2], "batch landing should match Projectile.landing"
+
+    # Test landing tables: interpolated landings stay within their error bound of the exact ones,
+    # also for the mirrored table of the player on the right
+    with tempfile.TemporaryDirectory() as cacheDir:
+        grid = dict(angles=(0, 90, 19), velocities=(0, 100, 21), winds=(-10, 10, 5), cacheDir=cacheDir)
+        tableGame = gamemodel.Game(10, 3)
+        for player in tableGame.getPlayers():
+            table = LandingTable.forPlayer(player, **grid)
+            for angle, velocity, wind in ((30, 31, 0), (45, 41, -1), (45, 41, 3.3), (60, 25, 7), (20, 35, -6.5), (10, 20, 9)):
+                tableGame.setCurrentWind(wind)
+                exact = player.fire(angle, velocity).landing()[1]
+                x, errorBound = table.landingX(angle, velocity, wind)
+                assert abs(x - exact) <= errorBound, "table landing {0:f} should be within {1:f} of {2:f}".format(x, errorBound, exact)
+        # Tables for other sizes or arenas are other files
+        path = LandingTable.forPlayer(tableGame.getPlayers()[0], **grid).path
+        assert LandingTable.forPlayer(gamemodel.Game(12, 3).getPlayers()[0], **grid).path != path, "another cannon size should use another table"
+        assert LandingTable.forPlayer(gamemodel.Game(10, 3, arena=(-120, 120)).getPlayers()[0], **grid).path != path, "another arena should use another table"
+
+    # Test a game with three players in a wider arena
+    multi = gamemodel.Game(10, 3, positions=(-150, 0, 150), arena=(-200, 200))
+    multiPlayers = multi.getPlayers()
+    assert len(multiPlayers) == 3, "there should be three players"
+    assert [p.getX() for p in multiPlayers] == [-150, 0, 150], "players should stand at the given positions"
+    for i in (1, 2, 0, 1):
+        assert multi.getOtherPlayer() is multiPlayers[i], "the other player should be the next one to play"
+        multi.nextPlayer()
+        assert multi.getCurrentPlayerNumber() == i, "turns should go around all players and wrap to player 0"
+
+    # Hits are found on any cannon within reach, never on the shooter's own
+    assert multi.getPlayerHit(7, multiPlayers[0]) is multiPlayers[1], "a ball at x=7 touches the cannon at x=0"
+    assert multi.getPlayerHit(-143, multiPlayers[1]) is multiPlayers[0], "a ball at x=-143 touches the cannon at x=-150"
+    assert multi.getPlayerHit(150, multiPlayers[2]) is None, "a player can't hit its own cannon"
+    assert multi.getPlayerHit(150, multiPlayers[0]) is multiPlayers[2], "a ball at x=150 touches the cannon at x=150"
+    assert multi.getPlayerHit(75) is None, "a ball at x=75 touches no cannon"
+
+    # Projectiles fly until the walls of the arena, not the default ones at -110 and 110
+    multi.setCurrentWind(0)
+    proj = multiPlayers[1].fire(45, 40)
+    proj.land(1/50)
+    assert 110 < proj.getX() < 200, "projectile should land inside the wider arena, at {0:f}".format(proj.getX())
+    proj = multiPlayers[2].fire(45, 100)
+    proj.land(1/50)
+    assert proj.getX() == -200, "projectile should stop at the arena wall at x=-200"
+
+    # Test hilly terrain: closed-form landing and event-detecting steps should agree with stepping
+    hilly = gamemodel.Game(10, 3, seed=1)
+    terrain = Terrain.hills(hilly)
+    hilly.setTerrain(terrain)
+    hilly.setCurrentWind(2)
+    for angle, velocity in ((45, 40), (30, 25), (70, 35), (20, 60), (60, 15)):
+        for shooter in hilly.getPlayers():
+            time, x, hitWall = shooter.fire(angle, velocity).landing(1/50)
+            proj = shooter.fire(angle, velocity)
+            ticks = 0
+            while proj.isMoving():
+                proj.update(1/50)
+                ticks += 1
+            assert abs(ticks/50 - time) < 1e-9 and abs(proj.getX() - x) < 1e-9, "landing on terrain should match the update loop"
+            assert hitWall or abs(proj.getY() - terrain.heightAt(x)) < 1e-9, "projectile should stop on the ground"
+            proj = shooter.fire(angle, velocity)
+            impact = proj.advance(1000)
+            time, x, hitWall = shooter.fire(angle, velocity).landing()
+            assert impact is not None and abs(impact[0] - time) < 1e-6 and abs(proj.getX() - x) < 1e-6, "advance on terrain should stop at the impact"
+
+    # Test digging a crater
+    heights = terrain.heights.copy()
+    version = terrain.version
+    top = terrain.getXs()[heights.argmax()]
+    terrain.carve(top, 6)
+    assert terrain.version == version + 1, "carving should change the terrain version"
+    assert (terrain.heights <= heights).all(), "carving should never raise the ground"
+    assert terrain.heightAt(top) < heights.max(), "carving should lower the ground at the crater"
+
+    # Test the landing cache: repeated shots are hits, and a game with other sizes, another arena
+    # or changed terrain gets its landings computed again
+    cache = gamemodel.LandingCache()
+    for cachedGame in (gamemodel.Game(10, 3), gamemodel.Game(12, 3), gamemodel.Game(12, 3, arena=(-200, 200))):
+        cachedGame.setLandingCache(cache)
+        cachedGame.setCurrentWind(0)
+        shooter = cachedGame.getPlayers()[1]
+        misses = cache.getStats()["misses"]
+        time, x, hitWall = shooter.fire(45, 40).landing(1/50)
+        assert shooter.landing(45, 40, 1/50) == (x, time), "cached landing should match the projectile's landing"
+        assert shooter.landing(45, 40, 1/50) == (x, time), "cached landing should match the projectile's landing"
+        assert cache.getStats()["misses"] == misses + 1, "only the first landing should be computed"
+        assert len(cache) == 1, "the cache should be cleared when the game geometry changes"
+    assert cache.getStats()["hits"] == 3, "every repeated landing should be a cache hit"
+    terrain = Terrain.hills(cachedGame)
+    cachedGame.setTerrain(terrain)
+    time, x, hitWall = shooter.fire(45, 40).landing(1/50)
+    assert shooter.landing(45, 40, 1/50) == (x, time), "cached landing should land on the new terrain"
+    terrain.carve(x, 6)
+    time, x, hitWall = shooter.fire(45, 40).landing(1/50)
+    assert shooter.landing(45, 40, 1/50) == (x, time), "cached landing should land in the new crater"
+    assert cache.getStats()["misses"] == 5 and len(cache) == 1, "terrain changes should clear the cache"
+
+    # Test that a recorded game replays to the same final state
+    log = io.BytesIO()
+    result = playGame((randomStrategy, randomStrategy), "replay", maxShots=41, record=log)
+    replay = Replay(log.getvalue())
+    assert len(replay) == result.shots, "the replay should have one turn per shot"
+    final = replay.gameAt(len(replay))
+    assert tuple(p.getScore() for p in final.getPlayers()) == result.scores, "replayed scores should match the game"
+    assert replay.getScores(len(replay)) == result.scores, "replayed scores should match the game"
+    assert final.getCurrentPlayerNumber() == result.shots % 2, "the replayed game should have the same player to move"
+
     # A few additional hints
-    gameAtts = len(game.__dict__.items())
-    if (gameAtts > 5):
-        print("Your Game object has {} attributes. This isn't necessarily wrong, but 5 seems like a nice number.".format(gameAtts))
+    gameAtts = attributeCount(game)
+    if (gameAtts > 10):
+        print("Your Game object has {} attributes. This isn't necessarily wrong, but 10 (including the random generator, arena bounds, cannon index, landing cache and terrain) seems like a nice number.".format(gameAtts))
         print("Make sure you are not representing the same information in multiple attributes.")
-    playerAtts = len(game.getCurrentPlayer().__dict__.items())
+    playerAtts = attributeCount(game.getCurrentPlayer())
     if (playerAtts > 8):
         print("Your Player object has {} attributes. This isn't necessarily wrong, but it seems a bit high.".format(playerAtts))
 
 
 
+# The number of attributes set on an object, both in its __dict__ and in its __slots__
+def attributeCount(obj):
+    count = len(getattr(obj, "__dict__", {}))
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        count += sum(1 for name in slots if name not in ("__dict__", "__weakref__") and hasattr(obj, name))
+    return count
+
+
 def testGraphics():
     game = gamemodel.Game(10,3)
 
@@ -178,8 +356,38 @@ def testGraphics():
     assert len(circles) <= 2, "there should never be more than two circles! You need to undraw old cannonballs"
 
 
+def testImages():
+    # Test bulk pixel access: fill regions, write a block at an offset and read everything back
+    image = graphics.Image(graphics.Point(0,0), 8, 6)
+    image.fill("blue")
+    image.fill("#102030", 2, 1, 3, 2)
+    image.setPixels(bytes([255, 0, 0])*4, 5, 3, 2)
+    pixels = image.getPixels()
+    assert len(pixels) == 8*6*3, "getPixels should give 3 bytes per pixel"
+    def pixel(x, y):
+        return list(pixels[(y*8 + x)*3:(y*8 + x)*3 + 3])
+    assert pixel(0, 0) == [0, 0, 255] and pixel(7, 5) == [0, 0, 255], "fill should fill the whole image"
+    assert pixel(2, 1) == pixel(4, 2) == [16, 32, 48], "fill should fill the given region"
+    assert pixel(5, 1) == pixel(4, 3) == [0, 0, 255], "fill should stay inside the given region"
+    assert pixel(5, 3) == pixel(6, 4) == [255, 0, 0], "setPixels should write the block at its offset"
+    assert pixel(7, 3) == pixel(5, 5) == [0, 0, 255], "setPixels should only write the block"
+    assert image.getPixel(6, 4) == [255, 0, 0], "getPixel should see pixels from setPixels"
+    image.setPixels(pixels)
+    assert image.getPixels() == pixels, "writing back all pixels should change nothing"
+
+    # Blocks that don't fit in the image are errors
+    for x, y, width, size in ((7, 0, 2, 12), (0, 5, 2, 12), (-1, 0, 2, 12), (0, 0, 2, 9)):
+        try:
+            image.setPixels(bytes(size), x, y, width)
+        except graphics.GraphicsError:
+            continue
+        assert False, "setPixels of {} bytes, {} wide at ({},{}) should fail".format(size, width, x, y)
+
+
 runTests(gamemodel.Game(10,3))
 
+testImages()
+
 testGraphics()
 
 # If your graphical window or close immediately after running test, try uncommenting this
@@ -1,4 +1,6 @@
+import sys
 import gamemodel
+from textrender import TextRenderer
 
 # A simple textual interface
 def textInput(game):
@@ -12,11 +14,16 @@ def textInput(game):
     newVel = float(input())
     return newAngle, newVel
 
-""" Fires a projectile for the current player and animates it until it stops
+""" Fires a projectile for the current player and animates it until it stops, with a TextRenderer
+when one is given and by printing its position otherwise
 Returns the fired projectile """
-def textFire(game, angle, vel):
+def textFire(game, angle, vel, renderer=None):
     player = game.getCurrentPlayer()
     proj = player.fire(angle, vel)
+    if renderer is not None:
+        renderer.animate(proj)
+        print('Impact at position {0:.1f}!'.format(proj.getX()))
+        return proj
     print('ball is moving ... ', end='')
     outputThrottle = 0
     while proj.isMoving():
@@ -35,16 +42,16 @@ def textFinishShot(game, proj):
     # The player opposing the current player
     other = game.getOtherPlayer()
 
-    # Check if we won
-    distance = other.projectileDistance(proj) 
-    if distance == 0.0:
+    # Check if we hit any other player
+    hit = game.getPlayerHit(proj.getX(), player)
+    if hit is not None:
         print('Direct hit! ' + player.getColor() + ' player wins the round!')
         player.increaseScore()
-        print('the current score is '+player.getColor()+':'+str(player.getScore())+', '+other.getColor()+':'+str(other.getScore()))
+        print('the current score is '+', '.join(p.getColor()+':'+str(p.getScore()) for p in game.getPlayers()))
         # Start a new round
         game.newRound()
     else:
-        print('missed by a distance of {0:.1f}'.format(distance))
+        print('missed by a distance of {0:.1f}'.format(other.projectileDistance(proj)))
 
     # Switch active player
     game.nextPlayer()
@@ -52,9 +59,14 @@ def textFinishShot(game, proj):
 """ The main game loop """
 def textPlay():
     game = gamemodel.Game(10,3)
+    # The animated view needs a terminal, output to a file or pipe gets the positions printed
+    renderer = TextRenderer(game) if sys.stdout.isatty() else None
     while True:
+        if renderer is not None:
+            renderer.start()
+            renderer.render(force=True)
         angle, vel = textInput(game)
-        proj = textFire(game, angle, vel)
+        proj = textFire(game, angle, vel, renderer)
         textFinishShot(game, proj)
         print("<press enter to continue>")
         input()
@@ -0,0 +1,175 @@
+import sys
+import time
+
+"""
+    An animated view of a game for text terminals: the cannons, the ground (and terrain), the balls
+    in flight and a status line with the wind and the scores, drawn with plain ASCII characters.
+
+    The renderer keeps two character framebuffers, the one on the terminal and the one being drawn.
+    A frame only sends the cells that changed, as runs of characters after an ANSI cursor move, and
+    frames come at most maxFps times per second. A flying ball costs a few dozen bytes per frame,
+    so the view stays smooth over slow SSH connections.
+"""
+
+ESCAPE = "\x1b["
+
+# Changed cells this close together are sent in one run, that's shorter than a cursor move
+MERGE_GAP = 4
+
+GROUND = ord("=")
+TERRAIN = ord("#")
+BALL = ord("o")
+# Drawn in the top row above a ball that is higher than the view
+BALL_ABOVE = ord("^")
+SPACE = ord(" ")
+
+
+class TextRenderer:
+    """
+        game: the game to show
+        width, height: the size of the view in characters, the last row is the status line
+        file: the terminal to write to, by default sys.stdout
+        maxFps: the most frames sent per second, render skips frames that come sooner
+    """
+    def __init__(self, game, width=79, height=14, file=None, maxFps=30, clock=time.perf_counter):
+        self.game = game
+        self.width = width
+        self.height = height
+        self.file = file or sys.stdout
+        self.frameTime = 1/maxFps
+        self.clock = clock
+        self.lastFrame = None
+        # What is on the terminal, and the frame being drawn
+        self.front = [bytearray(width) for row in range(height)]
+        self.back = [bytearray(width) for row in range(height)]
+        self.frames = 0
+        self.skippedFrames = 0
+        self.bytesWritten = 0
+
+        # The world x-position of every column, and the scale: terminal characters are about twice as tall as wide
+        xLower, xUpper = game.getArenaBounds()
+        self.xLower = xLower
+        self.unitsPerColumn = (xUpper - xLower) / (width - 1)
+        self.unitsPerRow = 2*self.unitsPerColumn
+        self.columnXs = [xLower + column*self.unitsPerColumn for column in range(width)]
+        self.groundRow = height - 2
+
+    """ Clears the terminal and draws the whole view at the next render, the cursor is left below the view """
+    def start(self):
+        for row in self.front:
+            row[:] = bytes(self.width)
+        self.lastFrame = None
+        self._write(ESCAPE + "2J" + ESCAPE + "{};1H".format(self.height + 1))
+
+    """
+        Draws the game with the given projectiles and sends the changes to the terminal, unless the
+        last frame was less than 1/maxFps seconds ago (and force is False).
+        Returns whether a frame was sent.
+    """
+    def render(self, projectiles=(), force=False):
+        now = self.clock()
+        if not force and self.lastFrame is not None and now - self.lastFrame < self.frameTime:
+            self.skippedFrames += 1
+            return False
+        self.lastFrame = now
+        self._compose(projectiles)
+        self._present()
+        self.frames += 1
+        return True
+
+    """
+        Animates the flight of proj until it stops, with a physics step of dt seconds, in real time
+        unless realTime is False. Returns the flight time.
+    """
+    def animate(self, proj, dt=1/50, realTime=True):
+        self._write(ESCAPE + "?25l")
+        flightTime = 0.0
+        nextStep = self.clock()
+        try:
+            self.render([proj], force=True)
+            while proj.isMoving():
+                proj.update(dt)
+                flightTime += dt
+                self.render([proj])
+                if realTime:
+                    nextStep += dt
+                    time.sleep(max(nextStep - self.clock(), 0))
+            self.render([proj], force=True)
+        finally:
+            self._write(ESCAPE + "?25h")
+        return flightTime
+
+    # The column of world x-position x, the row of world y-position y
+    def _column(self, x):
+        return int(round((x - self.xLower) / self.unitsPerColumn))
+
+    def _row(self, y):
+        return self.groundRow - int(round(y / self.unitsPerRow))
+
+    # Draws the game into the back buffer
+    def _compose(self, projectiles):
+        back = self.back
+        width = self.width
+        for row in back[:self.groundRow]:
+            row[:] = b" "*width
+        back[self.groundRow][:] = bytes([GROUND])*width
+
+        terrain = self.game.getTerrain()
+        if terrain is not None:
+            for column, height in enumerate(terrain.heightsAt(self.columnXs).tolist()):
+                for row in range(max(self._row(height), 0), self.groundRow):
+                    back[row][column] = TERRAIN
+
+        # Cannons as blocks of the first letter of their color
+        size = self.game.getCannonSize()
+        for player in self.game.getPlayers():
+            letter = ord(player.getColor()[:1].upper() or "?")
+            left = max(self._column(player.getX() - size/2), 0)
+            right = min(self._column(player.getX() + size/2), width - 1)
+            for row in range(max(self._row(size), 0), self.groundRow):
+                back[row][left:right + 1] = bytes([letter])*(right + 1 - left)
+
+        for proj in projectiles:
+            column = self._column(proj.getX())
+            if 0 <= column < width:
+                row = self._row(proj.getY())
+                if row < 0:
+                    back[0][column] = BALL_ABOVE
+                else:
+                    back[min(row, self.groundRow)][column] = BALL
+
+        back[self.height - 1][:] = self._status().encode("ascii", "replace")
+
+    # The status line: the wind as an arrow and its speed, and the scores
+    def _status(self):
+        wind = self.game.getCurrentWind()
+        arrow = (">" if wind >= 0 else "<") * min(int(abs(wind)/3) + 1, 5)
+        scores = "  ".join("{} {}".format(player.getColor(), player.getScore()) for player in self.game.getPlayers())
+        status = "wind {:<5} {:4.1f}   {}".format(arrow, abs(wind), scores)
+        return status[:self.width].ljust(self.width)
+
+    # Sends the cells of the back buffer that differ from the front buffer, and swaps the buffers
+    def _present(self):
+        out = []
+        for number, (front, back) in enumerate(zip(self.front, self.back)):
+            if front == back:
+                continue
+            start = end = None
+            for column in range(self.width):
+                if front[column] != back[column]:
+                    if start is None:
+                        start = column
+                    elif column - end > MERGE_GAP:
+                        out.append(ESCAPE + "{};{}H".format(number + 1, start + 1) + back[start:end].decode("ascii"))
+                        start = column
+                    end = column + 1
+            out.append(ESCAPE + "{};{}H".format(number + 1, start + 1) + back[start:end].decode("ascii"))
+        self.front, self.back = self.back, self.front
+        if out:
+            # Save and restore the cursor, so text written below the view stays where it was
+            self._write("\x1b7" + "".join(out) + "\x1b8")
+
+    def _write(self, text):
+        self.file.write(text)
+        self.file.flush()
+        self.bytesWritten += len(text)
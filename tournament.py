@@ -0,0 +1,165 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from gamemodel import Game
+from gameai import computerAim
+from gamereplay import ReplayRecorder
+
+"""
+    Round-robin tournaments between shooting strategies, played in parallel worker processes.
+
+    A strategy is a plain callable that takes the Game (its current player is the one about to shoot)
+    and returns (angle, velocity) the way Player.fire takes them. Strategies are sent to the worker
+    processes, so they have to be defined at module level.
+"""
+
+""" Always shoots with the initial aim of a player """
+def fixedStrategy(game):
+    return 45, 40
+
+""" Shoots at a random angle and velocity, drawn from the game's random generator so games stay reproducible """
+def randomStrategy(game):
+    rng = game.getRandom()
+    return rng.uniform(10, 80), rng.uniform(10, 80)
+
+""" The computer opponent from gameai, its search is bounded by evaluations only so the aim doesn't depend on machine load """
+def computerStrategy(game):
+    return computerAim(game, timeBudget=float("inf"))
+
+
+""" Holds the outcome of one tournament game """
+class GameResult:
+    def __init__(self, index, names, winner, shots, scores, misses):
+        self.index = index
+        self.names = names
+        # Position (0 or 1) of the winner in names, None for a draw
+        self.winner = winner
+        self.shots = shots
+        self.scores = scores
+        # The distances of all shots that missed, in order
+        self.misses = misses
+
+    def __repr__(self):
+        return "GameResult({}, {}, winner={}, shots={}, scores={})".format(
+            self.index, self.names, self.winner, self.shots, self.scores)
+
+
+"""
+    Plays one game between two strategies until one of them has pointsToWin points or maxShots
+    shots have been fired. Shots are resolved with the closed-form landing for the time step dt,
+    which gives the same result as animating them with that time step.
+    The game's random generator is seeded with seed, so a game can be replayed exactly.
+    With a binary file object as record, the turns are logged to it with a gamereplay.ReplayRecorder.
+"""
+def playGame(strategies, seed, pointsToWin=3, maxShots=200, dt=1/50, index=0, names=None, record=None):
+    game = Game(10, 3, seed)
+    game.newRound()
+    recorder = ReplayRecorder(record, game, dt) if record is not None else None
+    players = game.getPlayers()
+    misses = []
+    shots = 0
+    while shots < maxShots and max(p.getScore() for p in players) < pointsToWin:
+        shooter = game.getCurrentPlayerNumber()
+        player = game.getCurrentPlayer()
+        other = game.getOtherPlayer()
+        angle, velocity = strategies[game.getCurrentPlayerNumber()](game)
+        proj = player.fire(angle, velocity)
+        proj.land(dt)
+        shots += 1
+
+        # A hit on any cannon but the shooter's scores, misses are measured to the next player
+        distance = 0.0 if game.getPlayerHit(proj.getX(), player) is not None else other.projectileDistance(proj)
+        if distance == 0:
+            player.increaseScore()
+            game.newRound()
+        else:
+            misses.append(distance)
+        game.nextPlayer()
+        if recorder is not None:
+            recorder.record(shooter, angle, velocity, distance)
+
+    scores = tuple(p.getScore() for p in players)
+    if scores[0] == scores[1]:
+        winner = None
+    else:
+        winner = 0 if scores[0] > scores[1] else 1
+    if names is None:
+        names = tuple(s.__name__ for s in strategies)
+    return GameResult(index, names, winner, shots, scores, misses)
+
+
+# Runs in a worker process: plays a batch of games and returns all their results at once
+def _playBatch(strategies, games, pointsToWin, maxShots, dt):
+    results = []
+    for index, (first, second), seed in games:
+        results.append(playGame((strategies[first][1], strategies[second][1]), seed, pointsToWin, maxShots, dt,
+                                index, (strategies[first][0], strategies[second][0])))
+    return results
+
+
+"""
+    Plays gamesPerPair games between every pair of strategies in worker processes and yields the
+    results in batches (lists of GameResults) as they finish, not necessarily in order.
+    strategies is a dict from name to strategy, or a list of strategies (named by their __name__).
+    Each game is seeded from seed and its index, so results do not depend on how games are spread
+    over the workers. Sides alternate between the games of a pair.
+"""
+def runTournament(strategies, gamesPerPair=10, seed=0, pointsToWin=3, maxShots=200, dt=1/50,
+                  workers=None, batchSize=50):
+    if not isinstance(strategies, dict):
+        strategies = {s.__name__: s for s in strategies}
+    strategies = list(strategies.items())
+    workers = workers or os.cpu_count() or 1
+
+    games = []
+    for first in range(len(strategies)):
+        for second in range(first+1, len(strategies)):
+            for n in range(gamesPerPair):
+                pair = (first, second) if n % 2 == 0 else (second, first)
+                games.append((len(games), pair, "{}:{}".format(seed, len(games))))
+    batches = [games[i:i+batchSize] for i in range(0, len(games), batchSize)]
+
+    with ProcessPoolExecutor(workers) as executor:
+        # Keep a bounded number of batches in flight so results stream back steadily
+        pending = set()
+        nextBatch = 0
+        while nextBatch < len(batches) or pending:
+            while nextBatch < len(batches) and len(pending) < 2*workers:
+                pending.add(executor.submit(_playBatch, strategies, batches[nextBatch], pointsToWin, maxShots, dt))
+                nextBatch += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+"""
+    Runs a whole tournament (see runTournament) and returns a dict with the standings
+    (wins, losses and draws per strategy), the total number of games and shots, and games per second.
+"""
+def playTournament(strategies, **options):
+    start = time.perf_counter()
+    standings = {}
+    games = shots = 0
+    for batch in runTournament(strategies, **options):
+        for result in batch:
+            games += 1
+            shots += result.shots
+            for position, name in enumerate(result.names):
+                record = standings.setdefault(name, {"wins": 0, "losses": 0, "draws": 0})
+                if result.winner is None:
+                    record["draws"] += 1
+                elif result.winner == position:
+                    record["wins"] += 1
+                else:
+                    record["losses"] += 1
+    elapsed = time.perf_counter() - start
+    return {"standings": standings, "games": games, "shots": shots, "seconds": elapsed,
+            "gamesPerSecond": games / elapsed if elapsed > 0 else 0.0}
+
+
+if __name__ == "__main__":
+    summary = playTournament([fixedStrategy, randomStrategy, computerStrategy], gamesPerPair=200)
+    for name, record in sorted(summary["standings"].items(), key=lambda item: -item[1]["wins"]):
+        print("{0:20} {1[wins]:6} wins {1[losses]:6} losses {1[draws]:6} draws".format(name, record))
+    print("{0} games, {1} shots in {2:.2f}s ({3:.0f} games/s)".format(
+        summary["games"], summary["shots"], summary["seconds"], summary["gamesPerSecond"]))